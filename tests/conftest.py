@@ -1,5 +1,9 @@
 import os
 
+import pytest
+from django.conf import settings as django_settings
+from django.test.utils import override_settings
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +41,23 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_without_pool(settings):
+    # Поток пула писал бы в базу в памяти параллельно с тестом.
+    settings.THUMBNAIL_WORKERS = 0
+
+
+@pytest.fixture(scope='session', autouse=True)
+def cache_in_tmp_path(tmp_path_factory):
+    # Как TestRunner: кеш пишется во временный каталог, а не в файл
+    # разработки yatube/cache.sqlite3.
+    directory = tmp_path_factory.mktemp('cache')
+    caches = {}
+    for alias, params in django_settings.CACHES.items():
+        caches[alias] = dict(params)
+        if params['BACKEND'] == 'core.cache.SQLiteCache':
+            caches[alias]['LOCATION'] = str(directory / f'{alias}.sqlite3')
+    with override_settings(CACHES=caches):
+        yield
@@ -0,0 +1,62 @@
+"""
+Кеш представлений постов для пакетного запроса.
+
+Клиент присылает только id, и дату изменения поста без запроса к базе
+не узнать, поэтому ключ зависит от одного id, а запись удаляют сигналы
+при изменении поста, его комментариев, автора или группы.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+from posts.models import Post
+
+from . import resources
+
+POST_CACHE_TIMEOUT = getattr(settings, 'API_POST_CACHE_TIMEOUT', 60 * 60)
+
+POST_CACHE_REQUESTS = metrics.Counter(
+    'yatube_api_post_cache_requests_total',
+    'Обращения к кешу постов API',
+    labels=('result',),
+)
+
+
+def post_key(post_id):
+    return f'api_post:{post_id}'
+
+
+def get_posts(ids):
+    """
+    Словарь id → представление поста для найденных постов.
+
+    Кеш читается одним get_many, промахи достаются из базы одним
+    in_bulk с select_related и сохраняются одним set_many.
+    """
+    keys = {post_key(post_id): post_id for post_id in ids}
+    items = {
+        keys[key]: item for key, item in cache.get_many(keys).items()}
+    missing = [post_id for post_id in ids if post_id not in items]
+    POST_CACHE_REQUESTS.inc('hit', amount=len(items))
+    if not missing:
+        return items
+    POST_CACHE_REQUESTS.inc('miss', amount=len(missing))
+    serialize = resources.POST.instance_serializer()
+    fetched = {
+        post_id: serialize(post) for post_id, post in Post.objects.
+        select_related('author', 'group').in_bulk(missing).items()
+    }
+    cache.set_many(
+        {post_key(post_id): item for post_id, item in fetched.items()},
+        POST_CACHE_TIMEOUT,
+    )
+    items.update(fetched)
+    return items
+
+
+def forget_post(post_id):
+    cache.delete(post_key(post_id))
+
+
+def forget_posts(ids):
+    cache.delete_many([post_key(post_id) for post_id in ids])
@@ -0,0 +1,129 @@
+"""
+Ручная сериализация ресурсов API.
+
+Ответ собирается из строк values(): модели не создаются, а из базы
+читаются только колонки запрошенных через ?fields= полей. Связанные
+таблицы присоединяются, только если нужно их поле.
+"""
+from django.conf import settings
+
+from posts import variants
+
+
+def media_url(name):
+    return f'{settings.MEDIA_URL}{name}' if name else None
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def _attribute(obj, path):
+    # author__username → obj.author.username; пустая связь дает None.
+    for name in path.split('__'):
+        if obj is None:
+            return None
+        obj = getattr(obj, name)
+    return obj
+
+
+class Resource:
+    """Поля ресурса: имя в ответе → колонка values() и преобразование."""
+
+    def __init__(self, fields, key=('id',), converters=None):
+        self.fields = dict(fields)
+        # Колонки ключа пагинации читаются всегда, даже если не запрошены.
+        self.key = tuple(key)
+        self.converters = converters or {}
+
+    def parse_fields(self, value):
+        """Имена полей из ?fields=; без параметра — все поля."""
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise FieldsError(
+                f'Неизвестные поля: {", ".join(unknown)}. '
+                f'Доступны: {", ".join(self.fields)}'
+            )
+        return list(dict.fromkeys(names))
+
+    def columns(self, names):
+        columns = [self.fields[name] for name in names]
+        return list(dict.fromkeys(columns + list(self.key)))
+
+    def serializer(self, names):
+        """Функция строка → словарь ответа для выбранных полей."""
+        pairs = [(name, self.fields[name]) for name in names]
+        converters = [
+            (name, self.converters[name]) for name in names
+            if name in self.converters
+        ]
+
+        def serialize(row):
+            item = {name: row[column] for name, column in pairs}
+            for name, convert in converters:
+                item[name] = convert(item[name])
+            return item
+        return serialize
+
+    def instance_serializer(self, names=None):
+        """Как serializer(), но для модели с загруженными связями."""
+        names = list(self.fields) if names is None else names
+        columns = self.columns(names)
+        serialize = self.serializer(names)
+
+        def serialize_instance(obj):
+            return serialize({
+                column: _attribute(obj, column) for column in columns})
+        return serialize_instance
+
+
+POST = Resource(
+    {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+        'thumbnail': 'thumbnail',
+        'variants': 'image_variants',
+        'comments_count': 'comments_count',
+    },
+    key=('pub_date', 'id'),
+    converters={
+        'image': media_url,
+        'thumbnail': lambda url: url or None,
+        'variants': variants.parse,
+    },
+)
+
+COMMENT = Resource(
+    {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    key=('created', 'id'),
+)
+
+GROUP = Resource({
+    'id': 'id',
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+})
+
+PROFILE = Resource({
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'counters__posts_count',
+    'followers_count': 'counters__followers_count',
+    'following_count': 'counters__following_count',
+})
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from posts.models import Comment, Group, Post, User
+
+from . import cache
+
+
+def forget_post(post_id):
+    # Второе удаление после коммита не дает оставить в кеше пост,
+    # прочитанный параллельным запросом до коммита.
+    cache.forget_post(post_id)
+    transaction.on_commit(lambda: cache.forget_post(post_id))
+
+
+def forget_posts(posts):
+    forget_ids(list(posts.values_list('pk', flat=True)))
+
+
+def forget_ids(ids):
+    if ids:
+        cache.forget_posts(ids)
+        transaction.on_commit(lambda: cache.forget_posts(ids))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    forget_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    # В представлении поста есть число комментариев.
+    forget_post(instance.post_id)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    # В представлении поста есть имя автора; вход меняет только last_login.
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    forget_posts(Post.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, **kwargs):
+    # В представлении поста есть slug группы.
+    if not created:
+        forget_posts(instance.posts.all())
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # SET_NULL обновляет посты без сигналов: запоминаем их до удаления.
+    instance._api_post_ids = list(
+        instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    forget_ids(getattr(instance, '_api_post_ids', []))
@@ -0,0 +1,288 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+from . import signals
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group)
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_posts_sparse_fields(self):
+        """?fields= оставляет в ответе только запрошенные поля."""
+        response = self.client.get(
+            reverse('api_v1:posts'), {'fields': 'id,author'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()['results']
+        self.assertEqual(len(results), len(self.posts))
+        self.assertEqual(
+            results[0], {'id': self.posts[-1].pk, 'author': 'author'})
+
+    def test_sparse_fields_skip_joins(self):
+        """Без полей связанных таблиц запрос обходится без JOIN."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api_v1:posts'), {'fields': 'id,text'})
+        selects = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('JOIN', selects[0])
+        self.assertNotIn('"image"', selects[0])
+
+    def test_cursor_pagination(self):
+        """Курсор ведет на следующую страницу без повторов."""
+        url = reverse('api_v1:posts')
+        first = self.client.get(url, {'limit': 3, 'fields': 'id'}).json()
+        second = self.client.get(url, {
+            'limit': 3, 'fields': 'id', 'cursor': first['next_cursor'],
+        }).json()
+        ids = [item['id'] for item in first['results'] + second['results']]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304."""
+        for url in (
+            reverse('api_v1:posts'),
+            reverse('api_v1:post', args=[self.posts[0].pk]),
+            reverse('api_v1:comments', args=[self.posts[0].pk]),
+            reverse('api_v1:groups'),
+            reverse('api_v1:profile', args=['author']),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_comment_changes_posts_etag(self):
+        """Новый комментарий меняет ETag списка: в нем comments_count."""
+        url = reverse('api_v1:posts')
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.posts[1], author=self.reader, text='Еще один')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_fields_change_etag(self):
+        """Разные наборы полей одного поста — разные ETag."""
+        url = reverse('api_v1:post', args=[self.posts[0].pk])
+        self.assertNotEqual(
+            self.client.get(url, {'fields': 'id'})['ETag'],
+            self.client.get(url, {'fields': 'text'})['ETag'],
+        )
+
+    def test_detail_resources(self):
+        post = self.posts[0]
+        response = self.client.get(reverse('api_v1:post', args=[post.pk]))
+        self.assertEqual(response.json()['group'], 'group')
+        self.assertEqual(response.json()['comments_count'], 1)
+        comments = self.client.get(
+            reverse('api_v1:comments', args=[post.pk])).json()['results']
+        self.assertEqual(comments[0]['author'], 'reader')
+        group = self.client.get(reverse('api_v1:group', args=['group']))
+        self.assertEqual(group.json()['title'], 'Группа')
+        profile = self.client.get(reverse('api_v1:profile', args=['author']))
+        self.assertEqual(profile.json()['posts_count'], len(self.posts))
+
+    def test_errors_are_json(self):
+        """Ошибки отдаются в JSON с подходящим статусом."""
+        cases = (
+            (reverse('api_v1:posts'), {'fields': 'nope'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api_v1:posts'), {'limit': '1000'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api_v1:post', args=[0]), {}, HTTPStatus.NOT_FOUND),
+            (reverse('api_v1:comments', args=[0]), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api_v1:feed'), {}, HTTPStatus.UNAUTHORIZED),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api_v1:posts'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_feed(self):
+        """Лента подписок содержит посты автора, на которого подписан."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('api_v1:feed'), {'fields': 'id'})
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']],
+            [post.pk for post in reversed(self.posts)],
+        )
+
+    def test_feed_matches_site_feed(self):
+        """API отдает ту же ленту, что и сайт, с постами знаменитостей."""
+        other = User.objects.create_user(username='other')
+        celebrity_post = Post.objects.create(text='Звезда', author=other)
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0):
+            Follow.objects.create(user=self.reader, author=other)
+            self.client.force_login(self.reader)
+            response = self.client.get(
+                reverse('api_v1:feed'), {'fields': 'id'})
+            expected = [
+                post.pk for post in timeline.feed(self.reader)]
+        ids = [item['id'] for item in response.json()['results']]
+        self.assertEqual(ids, expected)
+        self.assertIn(celebrity_post.pk, ids)
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(4)
+        ]
+        cls.url = reverse('api_v1:posts_batch')
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, *posts):
+        return ','.join(str(post.pk) for post in posts)
+
+    def test_same_as_detail(self):
+        """Пакет отдает посты в порядке ids и в том же виде, что детальный."""
+        order = [self.posts[2], self.posts[0], self.posts[1]]
+        results = self.client.get(
+            self.url, {'ids': self.ids(*order)}).json()['results']
+        self.assertEqual(
+            results,
+            [
+                self.client.get(
+                    reverse('api_v1:post', args=[post.pk])).json()
+                for post in order
+            ],
+        )
+
+    def test_cache_first(self):
+        """Повторный пакет читает из базы только промахи."""
+        self.client.get(self.url, {'ids': self.ids(*self.posts[:2])})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'ids': self.ids(*self.posts)})
+        selects = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertIn(str(self.posts[3].pk), selects[0])
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'ids': self.ids(*self.posts)})
+
+    def test_missing_and_fields(self):
+        response = self.client.get(self.url, {
+            'ids': f'{self.posts[0].pk},0', 'fields': 'id,group'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.posts[0].pk, 'group': None}],
+            'missing': [0],
+        })
+
+    def test_changes_forget_cached_post(self):
+        """Правка поста и новый комментарий сбрасывают его запись."""
+        post = self.posts[0]
+        params = {'ids': self.ids(post), 'fields': 'text,comments_count'}
+        self.client.get(self.url, params)
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            post.text = 'Новый текст'
+            post.save()
+            Comment.objects.create(
+                post=post, author=self.author, text='Комментарий')
+        self.assertEqual(
+            self.client.get(self.url, params).json()['results'],
+            [{'text': 'Новый текст', 'comments_count': 1}],
+        )
+
+    def test_author_and_group_changes_forget_cached_posts(self):
+        """Переименование автора или группы сбрасывает записи их постов."""
+        post = self.posts[1]
+        params = {'ids': self.ids(post), 'fields': 'author,group'}
+        self.client.get(self.url, params)
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            User.objects.filter(pk=self.author.pk).update(
+                username='renamed')
+            User.objects.get(pk=self.author.pk).save()
+            group = Group.objects.get(pk=self.group.pk)
+            group.slug = 'moved'
+            group.save()
+        self.assertEqual(
+            self.client.get(self.url, params).json()['results'],
+            [{'author': 'renamed', 'group': 'moved'}],
+        )
+
+    def test_group_delete_forgets_cached_posts(self):
+        """Удаление группы сбрасывает записи постов, потерявших группу."""
+        post = self.posts[1]
+        params = {'ids': self.ids(post), 'fields': 'group'}
+        self.client.get(self.url, params)
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            Group.objects.get(pk=self.group.pk).delete()
+        self.assertEqual(
+            self.client.get(self.url, params).json()['results'],
+            [{'group': None}],
+        )
+
+    def test_login_keeps_cached_posts(self):
+        """Вход автора не сбрасывает кеш его постов."""
+        post = self.posts[0]
+        self.client.get(self.url, {'ids': self.ids(post)})
+        self.client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'ids': self.ids(post)})
+        self.assertFalse(any(
+            'FROM "posts_post"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_bad_ids(self):
+        for ids in ('', 'a,b', ','.join(map(str, range(1, 200)))):
+            with self.subTest(ids=ids):
+                response = self.client.get(self.url, {'ids': ids})
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST)
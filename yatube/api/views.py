@@ -0,0 +1,182 @@
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.middleware.http import ConditionalGetMiddleware
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import decorator_from_middleware
+from django.views.decorators.http import require_GET
+
+from posts import timeline
+from posts.conditional import comments_etag, conditional
+from posts.models import Comment, Group, Post, User
+from posts.pagination import CursorPaginator
+
+from . import cache, resources
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+BATCH_LIMIT = getattr(settings, 'API_BATCH_LIMIT', 100)
+
+# Для ресурсов без дешевого валидатора ETag — хеш тела ответа:
+# view выполняется, но клиент с актуальной копией получает пустой 304.
+content_etag = decorator_from_middleware(ConditionalGetMiddleware)
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """Только GET и ошибки в JSON вместо HTML-страниц."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse(
+                {'error': 'Не найдено'}, status=HTTPStatus.NOT_FOUND)
+        except (ApiError, resources.FieldsError) as error:
+            status = getattr(error, 'status', HTTPStatus.BAD_REQUEST)
+            return JsonResponse({'error': str(error)}, status=status)
+    return wrapper
+
+
+def page_size(request):
+    value = request.GET.get('limit', '')
+    if not value:
+        return PAGE_SIZE
+    if not value.isdigit() or not 0 < int(value) <= MAX_PAGE_SIZE:
+        raise ApiError(f'limit должен быть от 1 до {MAX_PAGE_SIZE}')
+    return int(value)
+
+
+def paginated(request, queryset, resource, ordering):
+    """Страница ресурса по курсору с полями из ?fields=."""
+    names = resource.parse_fields(request.GET.get('fields'))
+    rows = queryset.values(*resource.columns(names))
+    page = CursorPaginator(
+        rows, page_size(request), ordering=ordering,
+    ).get_page(request.GET.get('cursor'))
+    serialize = resource.serializer(names)
+    return JsonResponse({
+        'results': [serialize(row) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def detail(request, queryset, resource):
+    names = resource.parse_fields(request.GET.get('fields'))
+    row = queryset.values(*resource.columns(names)).first()
+    if row is None:
+        raise Http404
+    return JsonResponse(resource.serializer(names)(row))
+
+
+@api_view
+# Поколения лент не меняются от комментариев и переименований, а
+# comments_count, author и group в ответе от них зависят.
+@content_etag
+@conditional(None)
+def posts(request):
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return paginated(
+        request, queryset, resources.POST, ('-pub_date', '-id'))
+
+
+def batch_ids(request):
+    """Уникальные id из ?ids=1,2,3 в исходном порядке."""
+    values = [
+        value.strip() for value in request.GET.get('ids', '').split(',')
+        if value.strip()
+    ]
+    if not values:
+        raise ApiError('Передайте id постов в ?ids=')
+    if not all(value.isdigit() for value in values):
+        raise ApiError('id постов должны быть числами')
+    ids = list(dict.fromkeys(map(int, values)))
+    if len(ids) > BATCH_LIMIT:
+        raise ApiError(f'Не больше {BATCH_LIMIT} постов за запрос')
+    return ids
+
+
+@api_view
+@content_etag
+@conditional(None)
+def posts_batch(request):
+    """Несколько постов за один запрос в порядке ?ids=."""
+    ids = batch_ids(request)
+    names = resources.POST.parse_fields(request.GET.get('fields'))
+    items = cache.get_posts(ids)
+    return JsonResponse({
+        'results': [
+            {name: items[post_id][name] for name in names}
+            for post_id in ids if post_id in items
+        ],
+        'missing': [post_id for post_id in ids if post_id not in items],
+    })
+
+
+@api_view
+# Валидатор с полным путем: ответы с разными ?fields= не смешиваются.
+@conditional(comments_etag)
+def post(request, post_id):
+    return detail(
+        request, Post.objects.filter(pk=post_id), resources.POST)
+
+
+@api_view
+@conditional(comments_etag)
+def comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return paginated(
+        request, Comment.objects.filter(post_id=post_id),
+        resources.COMMENT, ('-created', '-id'),
+    )
+
+
+@api_view
+@content_etag
+@conditional(None)
+def groups(request):
+    return paginated(request, Group.objects.all(), resources.GROUP, ('id',))
+
+
+@api_view
+@content_etag
+@conditional(None)
+def group(request, slug):
+    return detail(
+        request, Group.objects.filter(slug=slug), resources.GROUP)
+
+
+@api_view
+@content_etag
+# Поколение автора не меняется, когда он сам на кого-то подписался.
+@conditional(None)
+def profile(request, username):
+    return detail(
+        request, User.objects.filter(username=username), resources.PROFILE)
+
+
+@api_view
+@content_etag
+@conditional(None)
+def feed(request):
+    """Лента подписок: материализованная часть плюс знаменитости."""
+    if not request.user.is_authenticated:
+        raise ApiError(
+            'Нужна авторизация', status=HTTPStatus.UNAUTHORIZED)
+    return paginated(
+        request, timeline.feed(request.user), resources.POST,
+        ('-pub_date', '-id'),
+    )
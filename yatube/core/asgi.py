@@ -0,0 +1,283 @@
+"""
+ASGI-обработчик поверх WSGIHandler для Django 2.2.
+
+В Django 2.2 нет ни ASGIHandler, ни асинхронных view, поэтому
+обработчик делит запрос на две части. Сеть — чтение тела запроса
+и отправка ответа медленному клиенту — живет в цикле событий и
+потоков не занимает. View со всеми запросами к базе выполняется в
+ограниченном пуле потоков и освобождает поток сразу после того, как
+ответ готов. Так число медленных клиентов больше не упирается в число
+воркеров.
+
+Потоковый ответ отдается по кускам из однопоточного исполнителя,
+который ответ занимает до конца: курсор iterator() и соединение с базой
+привязаны к потоку, в котором генератор начал работу. Таких
+исполнителей ASGI_STREAM_THREADS на процесс; если все заняты, ответ
+закрывается, не начавшись, и клиент получает 503. Если у ответа есть
+async_content — фабрика асинхронного итератора, как у потока SSE, —
+тело берется из него прямо в цикле событий, а отключение клиента
+сразу прерывает поток.
+"""
+import asyncio
+import contextlib
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+ASGI_THREADS = getattr(settings, 'ASGI_THREADS', 10)
+ASGI_STREAM_THREADS = getattr(settings, 'ASGI_STREAM_THREADS', 10)
+# Через сколько секунд клиенту повторить запрос, если потоки заняты.
+STREAM_RETRY_AFTER = 5
+# Тело запроса больше этого размера уходит во временный файл.
+BODY_MEMORY_LIMIT = 1024 * 1024
+# Ключ environ со scope ASGI: по нему view узнают, что работают под ASGI.
+SCOPE_KEY = 'asgi.scope'
+
+_END = object()
+
+
+def _latin1(value):
+    # WSGI передает байты из сети как строки latin-1 (PEP 3333).
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return value.decode('latin-1')
+
+
+def build_environ(scope, body):
+    """Окружение WSGI из scope ASGI и уже прочитанного тела."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': _latin1(scope.get('root_path', '')),
+        'PATH_INFO': _latin1(scope['path']),
+        'QUERY_STRING': _latin1(scope.get('query_string', b'')),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        SCOPE_KEY: scope,
+    }
+    for name, value in scope.get('headers', ()):
+        name = _latin1(name).upper().replace('-', '_')
+        value = _latin1(value)
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            # Повторные Cookie склеиваются через "; " (RFC 7540, 8.1.2.5),
+            # остальные заголовки — через запятую.
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{environ[name]}{separator}{value}'
+        environ[name] = value
+    return environ
+
+
+def is_asgi(request):
+    """Запрос пришел через ASGIHandler, а не через сервер WSGI."""
+    return SCOPE_KEY in request.META
+
+
+def _busy():
+    """Ответ 503, когда все исполнители потоковых ответов заняты."""
+    return (
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        [
+            (b'content-type', b'text/plain; charset=utf-8'),
+            (b'retry-after', str(STREAM_RETRY_AFTER).encode()),
+        ],
+        'Сервер занят, повторите запрос позже'.encode(),
+    )
+
+
+class ASGIHandler:
+    """Приложение ASGI 3.0: HTTP и lifespan."""
+
+    def __init__(self, threads=ASGI_THREADS,
+                 stream_threads=ASGI_STREAM_THREADS):
+        self.wsgi = WSGIHandler()
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi')
+        # Свободные исполнители потоковых ответов. Берутся и
+        # возвращаются только из цикла событий, поэтому без блокировки.
+        self.streams = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix='asgi-stream')
+            for _ in range(stream_threads)
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип scope: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                for stream in self.streams:
+                    stream.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса целиком или None, если клиент отключился."""
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        with body:
+            environ = build_environ(scope, body)
+            status, headers, chunks = await loop.run_in_executor(
+                self.executor, self.call_wsgi, environ)
+        stream = None
+        if not isinstance(chunks, bytes) and chunks.async_content is None:
+            if not self.streams:
+                await loop.run_in_executor(self.executor, chunks.close)
+                status, headers, chunks = _busy()
+            else:
+                stream = self.streams.pop()
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': headers,
+            })
+            if isinstance(chunks, bytes):
+                await send({'type': 'http.response.body', 'body': chunks})
+            elif stream is None:
+                await self.send_async(chunks, receive, send)
+            else:
+                await self.send_stream(chunks, stream, send)
+        finally:
+            if stream is not None:
+                self.streams.append(stream)
+
+    async def send_stream(self, chunks, stream, send):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Куски генерируются в потоке этого ответа, отправка
+                # между ними поток не держит.
+                chunk = await loop.run_in_executor(
+                    stream, next, chunks, _END)
+                if chunk is _END:
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body'})
+        finally:
+            await loop.run_in_executor(stream, chunks.close)
+
+    async def send_async(self, chunks, receive, send):
+        loop = asyncio.get_running_loop()
+        content = chunks.async_content()
+        disconnected = asyncio.ensure_future(self.disconnect(receive))
+        try:
+            while True:
+                chunk = asyncio.ensure_future(content.__anext__())
+                await asyncio.wait(
+                    {chunk, disconnected},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not chunk.done():
+                    chunk.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await chunk
+                    return
+                try:
+                    body = chunks.response.make_bytes(chunk.result())
+                except StopAsyncIteration:
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': body,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body'})
+        finally:
+            disconnected.cancel()
+            await content.aclose()
+            await loop.run_in_executor(self.executor, chunks.close)
+
+    async def disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    def call_wsgi(self, environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi(environ, start_response)
+        if getattr(response, 'streaming', False):
+            chunks = _Chunks(response)
+        else:
+            # Обычный ответ собирается и закрывается в том же потоке:
+            # request_finished закроет соединение с БД именно этого потока.
+            try:
+                chunks = b''.join(response)
+            finally:
+                response.close()
+        return (
+            started.get('status', HTTPStatus.INTERNAL_SERVER_ERROR),
+            started.get('headers', []),
+            chunks,
+        )
+
+
+class _Chunks:
+    """Итератор ответа WSGI, пропускающий пустые куски."""
+
+    def __init__(self, response):
+        self.response = response
+        self.iterator = iter(response)
+        self.async_content = getattr(response, 'async_content', None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            chunk = next(self.iterator)
+            if chunk:
+                return chunk
+
+    def close(self):
+        close = getattr(self.response, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,267 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Время последнего чтения обновляется не чаще раза в секунду: точности
+# хватает для LRU, а чтения почти не превращаются в записи.
+ACCESS_RESOLUTION = 1.0
+BUSY_TIMEOUT_MS = 5000
+# Старые сборки SQLite ограничивают число параметров запроса 999.
+MAX_PARAMS = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    # Число записей ведут триггеры: при каждой записи в кеш проверка
+    # переполнения читает одну строку вместо COUNT(*) по всей таблице.
+    'CREATE TABLE IF NOT EXISTS cache_size ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' entries INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO cache_size (id, entries) '
+    'SELECT 0, COUNT(*) FROM cache',
+    'CREATE TRIGGER IF NOT EXISTS cache_inserted AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_size SET entries = entries + 1; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_deleted AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_size SET entries = entries - 1; END',
+)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кеш в файле SQLite в режиме WAL, общий для всех процессов хоста.
+
+    Воркеры Gunicorn видят одни и те же записи и инвалидации без
+    внешнего сервиса. Поддерживаются TTL и вытеснение давно не
+    читавшихся записей при превышении MAX_ENTRIES.
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            }
+        }
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение нельзя переносить ни в другой поток, ни через fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            # Без этого INSERT OR REPLACE не вызывает триггер удаления
+            # и счетчик записей завышается.
+            connection.execute('PRAGMA recursive_triggers=ON')
+            with _Transaction(connection):
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _write(self):
+        """Транзакция с блокировкой на запись с самого начала."""
+        return _Transaction(self._connection())
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _alive(expires, now):
+        return expires is None or expires > now
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if not self._alive(expires, now):
+            self._delete_expired(key, now)
+            return default
+        if now - accessed > ACCESS_RESOLUTION:
+            self._connection().execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        now = time.time()
+        found = {}
+        for chunk in _chunks(list(made)):
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._connection().execute(
+                'SELECT key, value, expires FROM cache '
+                f'WHERE key IN ({placeholders})',
+                chunk,
+            )
+            found.update(
+                (made[key], pickle.loads(value))
+                for key, value, expires in rows if self._alive(expires, now)
+            )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            self._store(connection, key, value, timeout)
+            self._cull(connection)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        keys = {self._key(key, version): value for key, value in data.items()}
+        with self._write() as connection:
+            for key, value in keys.items():
+                self._store(connection, key, value, timeout)
+            self._cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is not None and self._alive(row[0], now):
+                return False
+            self._store(connection, key, value, timeout)
+            self._cull(connection)
+            return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now),
+            )
+            return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None or not self._alive(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._dumps(value), now, key),
+            )
+            return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+        return row is not None and self._alive(row[0], time.time())
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        made = [self._key(key, version) for key in keys]
+        for chunk in _chunks(made):
+            placeholders = ','.join('?' * len(chunk))
+            self._connection().execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', chunk)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединения живут до конца потока: открывать файл на каждый
+        # запрос дороже, чем держать его.
+        pass
+
+    def _store(self, connection, key, value, timeout):
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (key, self._dumps(value), self.get_backend_timeout(timeout),
+             time.time()),
+        )
+
+    def _delete_expired(self, key, now):
+        self._connection().execute(
+            'DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now))
+
+    @staticmethod
+    def _size(connection):
+        return connection.execute(
+            'SELECT entries FROM cache_size').fetchone()[0]
+
+    def _cull(self, connection):
+        if self._size(connection) <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = self._size(connection)
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            ' SELECT key FROM cache ORDER BY accessed LIMIT ?'
+            ')',
+            (count // self._cull_frequency,),
+        )
+
+
+def _chunks(items):
+    for start in range(0, len(items), MAX_PARAMS):
+        yield items[start:start + MAX_PARAMS]
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
@@ -0,0 +1,8 @@
+from core.asgi import is_asgi
+
+
+def live_events(request):
+    """Живые ленты включаются только под ASGI."""
+    return {
+        'live_events': is_asgi(request)
+    }
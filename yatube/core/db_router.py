@@ -0,0 +1,98 @@
+"""
+Чтение с реплик и запись в основную базу.
+
+На реплики уходят только GET-запросы к view из REPLICA_VIEWS; все
+остальное, включая фоновые задачи и команды, читает основную базу.
+После записи пользователь на REPLICA_STICKY_SECONDS закрепляется за
+основной базой через cookie, чтобы сразу увидеть свой пост или
+комментарий, даже если реплика еще отстает. Записью считаются и GET к
+view из REPLICA_WRITE_VIEWS: подписка и отписка работают по ссылкам.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_VIEWS = frozenset(getattr(settings, 'REPLICA_VIEWS', (
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)))
+REPLICA_WRITE_VIEWS = frozenset(getattr(settings, 'REPLICA_WRITE_VIEWS', (
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+)))
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+STICKY_COOKIE = 'use_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Псевдоним базы для чтения в текущем запросе; None — основная.
+_read_database = ContextVar('read_database', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+@contextmanager
+def primary_reads():
+    """Чтение из основной базы внутри запроса, обслуживаемого репликой."""
+    token = _read_database.set(None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения по view и закрепляет писавших."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _read_database.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_database.reset(token)
+        if replicas() and self.writes(request):
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def writes(self, request):
+        if request.method not in SAFE_METHODS:
+            return True
+        match = request.resolver_match
+        return match is not None and match.view_name in REPLICA_WRITE_VIEWS
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            replicas()
+            and request.method in SAFE_METHODS
+            and STICKY_COOKIE not in request.COOKIES
+            and request.resolver_match.view_name in REPLICA_VIEWS
+        ):
+            _read_database.set(random.choice(replicas()))
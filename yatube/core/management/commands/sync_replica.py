@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в локальные реплики: заменяет '
+        'репликацию при проверке чтения с реплик на машине разработчика.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте REPLICA_DATABASE')
+        source = connections[DEFAULT_DB_ALIAS]
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            if 'sqlite3' not in replica.settings_dict['ENGINE']:
+                raise CommandError(
+                    f'{alias}: синхронизируется только SQLite, '
+                    f'остальные реплики настраиваются средствами СУБД')
+            source.ensure_connection()
+            replica.close()
+            with sqlite3.connect(replica.settings_dict['NAME']) as target:
+                source.connection.backup(target)
+            self.stdout.write(self.style.SUCCESS(f'{alias}: скопировано'))
@@ -0,0 +1,140 @@
+"""
+Метрики процесса в текстовом формате Prometheus.
+
+Каждый поток пишет в свой шард, поэтому на горячем пути нет блокировок;
+шарды складываются только при чтении /metrics. Каждый воркер считает
+свое и подписывает серии меткой worker с pid процесса.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            # Блокировка берется один раз на поток.
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def _value(self, labels):
+        shard = self._shard()
+        value = shard.get(labels)
+        if value is None:
+            value = shard[labels] = self._new_value()
+        return value
+
+    def _merged(self):
+        totals = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for labels, value in dict(shard).items():
+                total = totals.setdefault(labels, self._new_value())
+                for position, item in enumerate(value):
+                    total[position] += item
+        return totals
+
+    def samples(self, worker):
+        raise NotImplementedError
+
+    def render(self, worker):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        lines.extend(
+            f'{name}{_labels(labels)} {_number(value)}'
+            for name, labels, value in self.samples(worker)
+        )
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_value(self):
+        return [0]
+
+    def inc(self, *labels, amount=1):
+        self._value(labels)[0] += amount
+
+    def samples(self, worker):
+        for labels, (value,) in sorted(self._merged().items()):
+            pairs = (*zip(self.label_names, labels), ('worker', worker))
+            yield self.name, pairs, value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labels)
+
+    def _new_value(self):
+        # Счетчики корзин, корзина +Inf и сумма наблюдений.
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value, *labels):
+        counts = self._value(labels)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self, worker):
+        bounds = [*map(_number, self.buckets), '+Inf']
+        for labels, counts in sorted(self._merged().items()):
+            pairs = (*zip(self.label_names, labels), ('worker', worker))
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket', (*pairs, ('le', bound)), cumulative)
+            yield f'{self.name}_sum', pairs, counts[-1]
+            yield f'{self.name}_count', pairs, cumulative
+
+
+def render():
+    worker = os.getpid()
+    return '\n'.join(metric.render(worker) for metric in REGISTRY) + '\n'
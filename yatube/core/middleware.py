@@ -0,0 +1,201 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Бюджеты запроса; превышение любого пишется в лог как предупреждение.
+QUERY_BUDGET = getattr(settings, 'QUERY_BUDGET', 30)
+SQL_TIME_BUDGET = getattr(settings, 'SQL_TIME_BUDGET', 0.2)
+# Столько одинаковых по форме запросов за запрос — почти наверняка N+1.
+DUPLICATE_QUERY_LIMIT = getattr(settings, 'DUPLICATE_QUERY_LIMIT', 5)
+
+# Латентность считается только для view этих приложений.
+METRICS_NAMESPACES = getattr(
+    settings, 'METRICS_NAMESPACES', ('posts', 'users', 'about', 'api_v1'))
+
+REQUEST_LATENCY = metrics.Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по имени URL',
+    labels=('view',),
+)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Стоимость одного запроса: SQL, шаблоны и собственные накладные."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest = (0.0, None)
+        self.shapes = Counter()
+        self.template_time = 0.0
+        self.overhead = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            finish = time.perf_counter()
+            duration = finish - start
+            self.queries += 1
+            self.sql_time += duration
+            if duration > self.slowest[0]:
+                self.slowest = (duration, sql)
+            # Параметры уже вынесены из текста: текст и есть форма запроса.
+            self.shapes[sql] += 1
+            self.overhead += time.perf_counter() - finish
+
+    @contextmanager
+    def rendering_template(self):
+        # Вложенные рендеры (карточки, include) уже входят во внешний.
+        if self.rendering:
+            yield
+            return
+        self.rendering = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.template_time += time.perf_counter() - start
+            self.rendering = False
+
+    def duplicates(self):
+        return {
+            sql: count for sql, count in self.shapes.items()
+            if count >= DUPLICATE_QUERY_LIMIT
+        }
+
+    def over_budget(self):
+        return self.queries > QUERY_BUDGET or self.sql_time > SQL_TIME_BUDGET
+
+    def as_dict(self):
+        duration, sql = self.slowest
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'slowest_ms': round(duration * 1000, 2),
+            'slowest_sql': sql,
+            'template_ms': round(self.template_time * 1000, 2),
+            'overhead_ms': round(self.overhead * 1000, 3),
+        }
+
+
+def current_stats():
+    """Статистика обрабатываемого запроса или None вне middleware."""
+    return _current.get()
+
+
+class QueryBudgetMiddleware:
+    """
+    Учет SQL и времени рендеринга шаблонов по каждому запросу.
+
+    Для каждого view пишет в лог одну JSON-строку: число запросов,
+    суммарное время SQL, самый медленный запрос и время шаблонов.
+    Повторяющиеся формы запросов (N+1) и превышение бюджетов логируются
+    как предупреждения. У потоковых ответов учитываются и запросы во
+    время отдачи тела, а строка лога пишется после последнего куска.
+
+    Итоги уходят в заголовок Server-Timing, но только при DEBUG или
+    SERVER_TIMING и сотрудникам: посторонним незачем видеть нагрузку.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        with self.measuring(stats):
+            response = self.get_response(request)
+        request.query_stats = stats
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, stats, response.streaming_content)
+        else:
+            self.report(request, response, stats)
+            if self.shows_timing(request):
+                self.add_server_timing(response, stats)
+        return response
+
+    @contextmanager
+    def measuring(self, stats):
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                yield
+        finally:
+            _current.reset(token)
+
+    def stream(self, request, response, stats, content):
+        # Учет включается на время получения каждого куска, а не на
+        # весь ответ: между кусками код сервера идет без него, а сами
+        # куски могут браться в разных потоках.
+        content = iter(content)
+        try:
+            while True:
+                with self.measuring(stats):
+                    chunk = next(content, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            self.report(request, response, stats)
+
+    def shows_timing(self, request):
+        if getattr(settings, 'SERVER_TIMING', settings.DEBUG):
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def add_server_timing(self, response, stats):
+        record = stats.as_dict()
+        response['Server-Timing'] = (
+            f'db;dur={record["sql_ms"]};desc="{stats.queries} queries", '
+            f'tpl;dur={record["template_ms"]}'
+        )
+
+    def report(self, request, response, stats):
+        match = request.resolver_match
+        record = {
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'status': response.status_code,
+            **stats.as_dict(),
+        }
+        duplicates = stats.duplicates()
+        if duplicates:
+            record['duplicates'] = duplicates
+        if duplicates or stats.over_budget():
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(record, ensure_ascii=False))
+
+
+class MetricsMiddleware:
+    """Гистограмма времени ответа по имени URL для /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None and match.namespace in METRICS_NAMESPACES:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start, match.view_name)
+        return response
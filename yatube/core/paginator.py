@@ -0,0 +1,42 @@
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import AutoField, Max
+from django.utils.functional import cached_property
+
+# Меньшие таблицы дешевле посчитать точно.
+ESTIMATE_THRESHOLD = 100_000
+
+
+def estimated_count(model):
+    """Примерное число строк таблицы без полного COUNT(*) или None."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    if isinstance(model._meta.pk, AutoField):
+        # Наибольший ключ берется из индекса; удаленные строки завышают
+        # оценку, но для навигации по списку этого достаточно.
+        return model._default_manager.aggregate(total=Max('pk'))['total']
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: без фильтров число строк оценивается.
+
+    Отфильтрованные списки считаются точно: фильтры сужают выборку по
+    индексам, и COUNT(*) по ней недорог.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list.model)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
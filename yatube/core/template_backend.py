@@ -0,0 +1,30 @@
+"""
+Шаблоны Django с учетом времени рендеринга для QueryBudgetMiddleware.
+
+Время пишется в статистику текущего запроса; вне middleware шаблоны
+рендерятся как обычно.
+"""
+from django.template import TemplateDoesNotExist
+from django.template.backends import django
+
+from .middleware import current_stats
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        stats = current_stats()
+        if stats is None:
+            return super().render(context, request)
+        with stats.rendering_template():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django.reraise(exc, self)
@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Окружение тестов: кеш во временном каталоге, а не в файле
+    разработки, и миниатюры без фонового пула. Поток пула писал бы в
+    базу в памяти параллельно с тестом, а она блокирует таблицы целиком.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp()
+        caches = {}
+        for alias, params in settings.CACHES.items():
+            caches[alias] = dict(params)
+            if params['BACKEND'] == 'core.cache.SQLiteCache':
+                caches[alias]['LOCATION'] = os.path.join(
+                    self.cache_directory, f'{alias}.sqlite3')
+        self.test_settings = override_settings(
+            CACHES=caches, THUMBNAIL_WORKERS=0)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,596 @@
+import asyncio
+import io
+import json
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.backends import django as django_backend
+from django.template.loader import render_to_string
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import resolve, reverse
+
+from posts import events
+from posts.cache import versioned_cache_page
+from posts.models import Post
+
+from . import metrics
+from .asgi import ASGIHandler, build_environ
+from .cache import SQLiteCache
+from .db_router import STICKY_COOKIE, ReplicaMiddleware
+from .middleware import DUPLICATE_QUERY_LIMIT, QueryBudgetMiddleware
+
+
+def set_in_child(location):
+    SQLiteCache(location, {}).set('из дочернего', 'процесса')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **params):
+        return SQLiteCache(self.location, params)
+
+    def test_simple(self):
+        """Значения сохраняются и читаются, отсутствие — default."""
+        self.cache.set('ключ', {'пост': [1, 2, 3]})
+        self.assertEqual(self.cache.get('ключ'), {'пост': [1, 2, 3]})
+        self.assertIsNone(self.cache.get('нет такого'))
+        self.assertEqual(self.cache.get('нет такого', 'default'), 'default')
+
+    def test_add(self):
+        """add не перезаписывает живой ключ."""
+        self.assertTrue(self.cache.add('ключ', 'первое'))
+        self.assertFalse(self.cache.add('ключ', 'второе'))
+        self.assertEqual(self.cache.get('ключ'), 'первое')
+
+    def test_expiration(self):
+        """Истекшие записи не читаются и не мешают add."""
+        self.cache.set('ключ', 'значение', 1)
+        self.cache.set('вечный', 'значение', None)
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get('ключ'))
+        self.assertFalse(self.cache.has_key('ключ'))
+        self.assertEqual(self.cache.get('вечный'), 'значение')
+        self.assertTrue(self.cache.add('ключ', 'новое'))
+
+    def test_zero_timeout_is_not_stored(self):
+        self.cache.set('ключ', 'значение', 0)
+        self.assertIsNone(self.cache.get('ключ'))
+
+    def test_touch(self):
+        """touch продлевает только существующие записи."""
+        self.cache.set('ключ', 'значение', 1)
+        self.assertTrue(self.cache.touch('ключ', 10))
+        time.sleep(1.1)
+        self.assertEqual(self.cache.get('ключ'), 'значение')
+        self.assertFalse(self.cache.touch('нет такого'))
+
+    def test_incr_decr(self):
+        self.cache.set('ключ', 1)
+        self.assertEqual(self.cache.incr('ключ'), 2)
+        self.assertEqual(self.cache.incr('ключ', 10), 12)
+        self.assertEqual(self.cache.decr('ключ', 2), 10)
+        self.assertEqual(self.cache.get('ключ'), 10)
+        with self.assertRaises(ValueError):
+            self.cache.incr('нет такого')
+
+    def test_many(self):
+        self.cache.set_many({'а': 1, 'б': 2, 'в': 3})
+        self.assertEqual(
+            self.cache.get_many(['а', 'б', 'г']), {'а': 1, 'б': 2})
+        self.cache.delete_many(['а', 'б'])
+        self.assertEqual(self.cache.get_many(['а', 'б', 'в']), {'в': 3})
+
+    def test_delete_and_clear(self):
+        self.cache.set('а', 1)
+        self.cache.set('б', 2)
+        self.cache.delete('а')
+        self.assertFalse(self.cache.has_key('а'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('б'))
+
+    def test_versions_and_prefix(self):
+        """Версии и KEY_PREFIX разделяют пространства ключей."""
+        self.cache.set('ключ', 'v1', version=1)
+        self.cache.set('ключ', 'v2', version=2)
+        self.assertEqual(self.cache.get('ключ', version=2), 'v2')
+        self.assertEqual(self.cache.get('ключ'), 'v1')
+        self.cache.incr_version('ключ', version=2)
+        self.assertEqual(self.cache.get('ключ', version=3), 'v2')
+        prefixed = self.make_cache(KEY_PREFIX='другой')
+        self.assertIsNone(prefixed.get('ключ'))
+
+    def test_get_or_set(self):
+        self.assertEqual(self.cache.get_or_set('ключ', lambda: 42), 42)
+        self.assertEqual(self.cache.get_or_set('ключ', 0), 42)
+
+    def test_cull_evicts_least_recently_used(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        cache = self.make_cache(OPTIONS={'MAX_ENTRIES': 4})
+        for number in range(4):
+            cache.set(number, number)
+            time.sleep(0.01)
+        connection = cache._connection()
+        connection.execute(
+            'UPDATE cache SET accessed = ? WHERE key LIKE ?',
+            (time.time(), '%:0'),
+        )
+        cache.set(4, 4)
+        self.assertEqual(cache.get(0), 0)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(4), 4)
+
+    def test_entry_counter(self):
+        """Счетчик записей совпадает с таблицей после замен и удалений."""
+        self.cache.set('ключ', 1)
+        self.cache.set('ключ', 2)
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.delete('a')
+        self.cache.add('ключ', 3)
+        connection = self.cache._connection()
+        self.assertEqual(
+            self.cache._size(connection),
+            connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0],
+        )
+        self.cache.clear()
+        self.assertEqual(self.cache._size(connection), 0)
+
+    def test_shared_between_processes(self):
+        """Запись из другого процесса видна сразу."""
+        self.cache.set('прогрев', True)
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=set_in_child, args=(self.location,))
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('из дочернего'), 'процесса')
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def run_view(self, view, user=None):
+        request = RequestFactory().get('/')
+        if user is not None:
+            request.user = user
+        response = QueryBudgetMiddleware(view)(request)
+        return request.query_stats, response
+
+    def test_counts_queries_and_templates(self):
+        """Учитываются запросы, их время и рендеринг шаблонов."""
+        def view(request):
+            User.objects.count()
+            User.objects.exists()
+            return HttpResponse(render_to_string('core/404.html'))
+
+        staff = User(username='staff', is_staff=True)
+        stats, response = self.run_view(view, staff)
+        self.assertEqual(stats.queries, 2)
+        self.assertIsNotNone(stats.slowest[1])
+        self.assertGreater(stats.template_time, 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_server_timing_is_for_staff_only(self):
+        """Без DEBUG посторонние не видят Server-Timing."""
+        def view(request):
+            return HttpResponse()
+
+        for user in (None, User(username='reader')):
+            with self.subTest(user=user):
+                _, response = self.run_view(view, user)
+                self.assertFalse(response.has_header('Server-Timing'))
+        with self.settings(SERVER_TIMING=True):
+            _, response = self.run_view(view)
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    def test_template_render_is_not_patched(self):
+        """Время шаблонов считает свой бэкенд, а не подмена Django."""
+        self.assertEqual(
+            django_backend.Template.render.__module__,
+            'django.template.backends.django',
+        )
+
+    def test_streaming_queries_are_counted(self):
+        """Запросы во время отдачи потокового ответа тоже учитываются."""
+        def rows():
+            for _ in range(3):
+                yield str(User.objects.count())
+
+        def view(request):
+            User.objects.exists()
+            return StreamingHttpResponse(rows())
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs, \
+                mock.patch('core.middleware.QUERY_BUDGET', 3):
+            stats, response = self.run_view(view)
+            self.assertEqual(stats.queries, 1)
+            self.assertEqual(b''.join(response.streaming_content), b'000')
+        self.assertEqual(stats.queries, 4)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['queries'], 4)
+
+    def test_duplicate_queries_are_logged(self):
+        """Повторяющиеся формы запросов попадают в лог как N+1."""
+        def view(request):
+            for pk in range(DUPLICATE_QUERY_LIMIT):
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.run_view(view)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            list(record['duplicates'].values()), [DUPLICATE_QUERY_LIMIT])
+
+    def test_budget_violation_is_logged(self):
+        """Превышение бюджета пишет структурированную строку лога."""
+        url = reverse('posts:group_posts', args=['no_such_group'])
+        with self.assertLogs('core.middleware', 'WARNING') as logs, \
+                mock.patch('core.middleware.QUERY_BUDGET', 0):
+            self.client.get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:group_posts')
+        self.assertEqual(record['status'], 404)
+        self.assertGreaterEqual(record['overhead_ms'], 0)
+
+
+class MetricsTests(TestCase):
+    def test_histogram_is_cumulative(self):
+        """Корзины гистограммы накопительные, потоки складываются."""
+        histogram = metrics.Histogram(
+            'test_seconds', 'Тест', labels=('view',), buckets=(0.1, 1))
+        metrics.REGISTRY.remove(histogram)
+        histogram.observe(0.05, 'a')
+        thread = threading.Thread(target=histogram.observe, args=(0.5, 'a'))
+        thread.start()
+        thread.join()
+        histogram.observe(5, 'a')
+        text = histogram.render(worker=1)
+        self.assertIn('test_seconds_bucket{view="a",worker="1",le="0.1"} 1',
+                      text)
+        self.assertIn('test_seconds_bucket{view="a",worker="1",le="1"} 2',
+                      text)
+        self.assertIn(
+            'test_seconds_bucket{view="a",worker="1",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{view="a",worker="1"} 3', text)
+        self.assertIn('test_seconds_sum{view="a",worker="1"} 5.55', text)
+
+    @override_settings(METRICS_TOKEN='секрет')
+    def test_metrics_endpoint(self):
+        """/metrics отдает латентность view и попадания в кеш ленты."""
+        cache.clear()
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        text = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer секрет',
+        ).content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"', text)
+        self.assertRegex(
+            text,
+            r'yatube_page_cache_requests_total\{cache="index_page",'
+            r'result="hit",worker="\d+"\} [1-9]',
+        )
+        self.assertIn('# TYPE yatube_thumbnail_seconds histogram', text)
+
+    def test_metrics_need_token(self):
+        """Без верного токена /metrics не отдается даже с localhost."""
+        cases = {
+            'без токена в настройках': ('', 'Bearer '),
+            'без заголовка': ('секрет', ''),
+            'чужой токен': ('секрет', 'Bearer другой'),
+        }
+        for name, (token, authorization) in cases.items():
+            with self.subTest(name), \
+                    self.settings(METRICS_TOKEN=token):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1',
+                    HTTP_AUTHORIZATION=authorization,
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, method, path, cookies=None,
+              read=lambda request: router.db_for_read(User)):
+        """База для чтения внутри view и ответ middleware."""
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        seen = {}
+
+        def view(request):
+            request.resolver_match = resolve(request.path_info)
+            middleware.process_view(request, None, (), {})
+            seen['alias'] = read(request)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        response = middleware(request)
+        return response, seen
+
+    def test_read_views_use_replica(self):
+        """GET к лентам и посту читает реплику, вне запроса — основную."""
+        for path in (reverse('posts:index'),
+                     reverse('posts:profile', args=['leo']),
+                     reverse('posts:post_detail', args=[1])):
+            with self.subTest(path=path):
+                _, seen = self.route('get', path)
+                self.assertEqual(seen['alias'], 'replica')
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_write(User), 'default')
+
+    def test_writes_use_primary_and_stick(self):
+        """Запись читает основную базу и закрепляет за ней пользователя."""
+        response, seen = self.route(
+            'post', reverse('posts:add_comment', args=[1]))
+        self.assertEqual(seen['alias'], 'default')
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        _, seen = self.route(
+            'get', reverse('posts:post_detail', args=[1]),
+            cookies={STICKY_COOKIE: '1'},
+        )
+        self.assertEqual(seen['alias'], 'default')
+
+    def test_follow_links_stick(self):
+        """Подписка по GET тоже запись: пользователь закрепляется."""
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name):
+                response, _ = self.route('get', reverse(name, args=['leo']))
+                self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_page_cache_is_filled_from_primary(self):
+        """Кеш страниц заполняется из основной базы, а не из реплики."""
+        @versioned_cache_page(lambda: ['test'], key_prefix='test_page')
+        def page(request):
+            return HttpResponse(router.db_for_read(User))
+
+        def read(request):
+            request.user = AnonymousUser()
+            return page(request).content.decode()
+
+        cache.clear()
+        _, seen = self.route('get', reverse('posts:index'), read=read)
+        self.assertEqual(seen['alias'], 'default')
+
+    def test_other_views_use_primary(self):
+        """View вне списка реплик читают основную базу."""
+        _, seen = self.route('get', reverse('posts:post_create'))
+        self.assertEqual(seen['alias'], 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик все идет в основную базу и cookie не ставится."""
+        response, seen = self.route('post', reverse('posts:post_create'))
+        self.assertEqual(seen['alias'], 'default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+def http_scope(path, method='GET', query_string=b''):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'localhost')],
+    }
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    def call(self, scope, messages):
+        """Прогоняет запрос через ASGI и возвращает отправленное."""
+        handler = ASGIHandler(threads=2)
+        self.addCleanup(handler.executor.shutdown)
+        incoming = list(messages)
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(handler(scope, receive, send))
+        return sent
+
+    def test_get(self):
+        """Страница отдается через пул потоков с данными из базы."""
+        user = User.objects.create_user(username='leo')
+        Post.objects.create(text='Пост через ASGI', author=user)
+        start, body = self.call(
+            http_scope('/'), [{'type': 'http.request'}])
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/html; charset=utf-8'), start['headers'])
+        self.assertIn('Пост через ASGI', body['body'].decode())
+
+    def test_body_in_chunks(self):
+        """Тело запроса собирается из нескольких сообщений."""
+        messages = [
+            {'type': 'http.request', 'body': b'q=', 'more_body': True},
+            {'type': 'http.request', 'body': b'test'},
+        ]
+
+        async def receive():
+            return messages.pop(0)
+
+        body = asyncio.run(ASGIHandler(threads=1).read_body(receive))
+        self.assertEqual(body.read(), b'q=test')
+
+    def test_disconnect(self):
+        """Отключившийся до конца тела клиент ответа не получает."""
+        sent = self.call(http_scope('/', 'POST'), [
+            {'type': 'http.request', 'body': b'a', 'more_body': True},
+            {'type': 'http.disconnect'},
+        ])
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки."""
+        sent = self.call({'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+        )
+
+    def test_environ(self):
+        """Путь, строка запроса и заголовки переводятся в WSGI."""
+        scope = http_scope('/group/тест/', query_string=b'page=2')
+        scope['headers'] += [
+            (b'content-type', b'text/plain'), (b'accept', b'a'),
+            (b'accept', b'b'),
+        ]
+        environ = build_environ(scope, io.BytesIO())
+        self.assertEqual(
+            environ['PATH_INFO'].encode('latin-1').decode(), '/group/тест/')
+        self.assertEqual(environ['QUERY_STRING'], 'page=2')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_ACCEPT'], 'a,b')
+
+    def test_repeated_cookies(self):
+        """Повторные Cookie склеиваются через точку с запятой."""
+        scope = http_scope('/')
+        scope['headers'] += [(b'cookie', b'a=1'), (b'cookie', b'b=2')]
+        environ = build_environ(scope, io.BytesIO())
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+
+    def test_event_stream_is_served_from_event_loop(self):
+        """Поток SSE отдается без пула и закрывается при отключении."""
+        handler = ASGIHandler(threads=1)
+        self.addCleanup(handler.executor.shutdown)
+        sent = []
+
+        async def run():
+            disconnected = asyncio.Event()
+            incoming = [{'type': 'http.request'}]
+
+            async def receive():
+                if incoming:
+                    return incoming.pop(0)
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if len(sent) == 2:
+                    # Поток ждет событие, пул при этом свободен.
+                    await asyncio.get_running_loop().run_in_executor(
+                        handler.executor, events.bus.publish,
+                        'index', 'post', {'id': 7})
+                elif len(sent) == 3:
+                    disconnected.set()
+
+            await asyncio.wait_for(
+                handler(http_scope('/events/'), receive, send), 5)
+
+        asyncio.run(run())
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'retry:', sent[1]['body'])
+        self.assertIn(b'data: {"id": 7}', sent[2]['body'])
+        self.assertEqual(len(sent), 3)
+        self.assertEqual(dict(events.bus._subscribers), {})
+
+    def test_streams_share_bounded_threads(self):
+        """Потоковые ответы сверх пула получают 503, поток не создается."""
+        closed = []
+
+        class Response:
+            streaming = True
+
+            def __iter__(self):
+                yield b'x'
+
+            def close(self):
+                closed.append(True)
+
+        def wsgi(environ, start_response):
+            start_response('200 OK', [])
+            return Response()
+
+        handler = ASGIHandler(threads=1, stream_threads=1)
+        self.addCleanup(handler.executor.shutdown)
+        handler.wsgi = wsgi
+        statuses = []
+
+        async def run():
+            first_started = asyncio.Event()
+            release = asyncio.Event()
+
+            async def receive():
+                return {'type': 'http.request'}
+
+            async def slow_send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                    first_started.set()
+                    await release.wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            first = asyncio.ensure_future(
+                handler(http_scope('/'), receive, slow_send))
+            await first_started.wait()
+            await handler(http_scope('/'), receive, send)
+            release.set()
+            await first
+            await handler(http_scope('/'), receive, send)
+
+        asyncio.run(asyncio.wait_for(run(), 5))
+        self.assertEqual(statuses, [200, 503, 200])
+        self.assertEqual(len(closed), 3)
+        self.assertEqual(len(handler.streams), 1)
+
+    def test_streaming_response_uses_one_thread(self):
+        """Все куски потокового ответа и close идут в одном потоке."""
+        threads = []
+
+        class Response:
+            streaming = True
+
+            def __iter__(self):
+                for _ in range(5):
+                    threads.append(threading.get_ident())
+                    yield b'x'
+
+            def close(self):
+                threads.append(threading.get_ident())
+
+        def wsgi(environ, start_response):
+            start_response('200 OK', [])
+            return Response()
+
+        handler = ASGIHandler(threads=2)
+        self.addCleanup(handler.executor.shutdown)
+        handler.wsgi = wsgi
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request'}
+
+        async def send(message):
+            sent.append(message)
+            # Пока ответ отдается, пул занят другими запросами.
+            await asyncio.get_running_loop().run_in_executor(
+                handler.executor, time.sleep, 0.001)
+
+        asyncio.run(handler(http_scope('/'), receive, send))
+        self.assertEqual(
+            b''.join(message.get('body', b'') for message in sent[1:]),
+            b'xxxxx')
+        self.assertEqual(len(threads), 6)
+        self.assertEqual(len(set(threads)), 1)
@@ -1,6 +1,11 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
 
 
 def page_not_found(request, exception):
@@ -20,3 +25,17 @@ def server_error(request):
 def permission_denied(request, exception):
     return render(request, 'core/403.html',
                   status=HTTPStatus.FORBIDDEN)
+
+
+def metrics_view(request):
+    # Адрес клиента не годится для проверки: за локальным прокси
+    # все запросы приходят с 127.0.0.1. Поэтому нужен токен.
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not constant_time_compare(
+            authorization, f'Bearer {token}'):
+        raise Http404
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,10 +1,45 @@
+from django import forms
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Substr
+from django.utils.text import Truncator
 
+from core.paginator import EstimatedCountPaginator
+
+from . import search
 from .models import Comment, Group, Post
 
+TEXT_PREVIEW_LENGTH = 80
+# Столько же символов выводит Post.__str__.
+POST_PREVIEW_LENGTH = 15
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без COUNT(*) по всей таблице и без полного текста строк."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Из базы читается только начало текста: лишний символ нужен,
+        # чтобы понять, обрезан ли текст.
+        return super().get_queryset(request).annotate(
+            text_preview=Substr('text', 1, TEXT_PREVIEW_LENGTH + 1),
+        ).defer('text')
+
+    def get_list_display(self, request):
+        return [
+            'short_text' if name == 'text' else name
+            for name in super().get_list_display(request)
+        ]
+
+    def short_text(self, obj):
+        return Truncator(obj.text_preview).chars(TEXT_PREVIEW_LENGTH)
+    short_text.short_description = 'Текст'
+
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,21 +47,68 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    autocomplete_fields = ('author', 'group')
     empty_value_display = '-пусто-'
 
+    def get_changelist_formset(self, request, **kwargs):
+        formset = super().get_changelist_formset(request, **kwargs)
+        # Групп немного: один список на все строки вместо запроса на строку.
+        field = formset.form.base_fields['group']
+        field.widget = forms.Select()
+        field.choices = [
+            ('', field.empty_label),
+            *((group.pk, str(group)) for group in field.queryset),
+        ]
+        return formset
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = search.match_query(search_term)
+        if not terms or not search.available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        matches = RawSQL(
+            f'SELECT rowid FROM {search.TABLE} '
+            f'WHERE {search.TABLE} MATCH %s',
+            [terms],
+        )
+        return queryset.filter(pk__in=matches), False
+
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'post',
         'text',
         'author',
         'created',
     )
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('author',)
+
+    def get_queryset(self, request):
+        # Из поста нужно только начало текста для колонки, а не весь текст.
+        return super().get_queryset(request).annotate(
+            post_preview=Substr('post__text', 1, POST_PREVIEW_LENGTH),
+        ).defer('post__text')
+
+    def get_list_display(self, request):
+        return [
+            'short_post' if name == 'post' else name
+            for name in super().get_list_display(request)
+        ]
+
+    def short_post(self, obj):
+        return obj.post_preview
+    short_post.short_description = 'Пост'
+    short_post.admin_order_field = 'post'
 
 
-admin.site.register(Group)
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    search_fields = ('title', 'slug')
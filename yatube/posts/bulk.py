@@ -0,0 +1,20 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def keep_auto_now(model, *field_names):
+    """
+    Временно отключает auto_now/auto_now_add у полей модели.
+
+    Нужно для массовой вставки записей с заранее известными датами:
+    иначе bulk_create перезапишет их текущим временем.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
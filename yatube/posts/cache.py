@@ -0,0 +1,178 @@
+import hashlib
+import math
+import random
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+from core.asgi import is_asgi
+from core.db_router import primary_reads
+
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60 * 6)
+VERSION_KEY = 'feed_version:{}'
+# Сколько секунд после мягкого истечения запись еще можно отдавать,
+# пока один из воркеров пересчитывает ее.
+STALE_TIMEOUT = getattr(settings, 'FEED_CACHE_STALE_TIMEOUT', 60)
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+POLL_INTERVAL = 0.05
+# Коэффициент вероятностного раннего истечения (XFetch): чем больше,
+# тем раньше дорогие записи начинают пересчитываться.
+EARLY_EXPIRATION_BETA = 1.0
+
+PAGE_CACHE_REQUESTS = metrics.Counter(
+    'yatube_page_cache_requests_total',
+    'Обращения к кешу страниц по префиксу ключа',
+    labels=('cache', 'result'),
+)
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def _initial_version():
+    # Время в миллисекундах: если ключ версии вытеснят из кеша,
+    # новая версия не совпадет ни с одной из уже использованных.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """Текущие поколения лент; отсутствующие заводятся на лету."""
+    keys = {VERSION_KEY.format(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    versions = {keys[key]: value for key, value in found.items()}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[scope] = cache.get(key)
+    return versions
+
+
+def bump(*scopes):
+    """Сдвигает поколения лент: старые ключи страниц перестают читаться."""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+
+
+def _expired(entry, now):
+    """XFetch: запись тем вероятнее «истекает» раньше, чем дольше расчет."""
+    early = entry['delta'] * EARLY_EXPIRATION_BETA * math.log(
+        1 - random.random())
+    return now - early >= entry['expires']
+
+
+def _release(lock_key, token):
+    # Блокировка могла истечь и достаться другому воркеру: снимаем
+    # только свою. API кеша не дает атомарного сравнения с удалением,
+    # но окно между get и delete несравнимо меньше времени пересчета.
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def get_or_compute(key, compute, timeout, cacheable=lambda value: True):
+    """
+    Значение из кеша с пересчетом в один поток.
+
+    Пересчет выполняет только тот, кто первым взял блокировку через
+    атомарный cache.add; остальные в это время получают устаревшее
+    значение, а при его отсутствии ждут, пока оно появится.
+    Возвращает пару (значение, попадание в кеш).
+    """
+    entry = cache.get(key)
+    if entry is not None and not _expired(entry, time.time()):
+        return entry['value'], True
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, LOCK_TIMEOUT):
+        try:
+            started = time.time()
+            value = compute()
+            if cacheable(value):
+                cache.set(key, {
+                    'value': value,
+                    'expires': started + timeout,
+                    'delta': time.time() - started,
+                }, timeout + STALE_TIMEOUT)
+            return value, False
+        finally:
+            _release(lock_key, token)
+    if entry is not None:
+        return entry['value'], True
+    deadline = time.time() + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value'], True
+    return compute(), False
+
+
+def _cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def versioned_cache_page(scopes, timeout=FEED_CACHE_TIMEOUT,
+                         key_prefix='feed'):
+    """
+    Кеш страниц, у которого в ключ вшиты поколения лент.
+
+    scopes получает аргументы view и возвращает список лент, от которых
+    зависит страница. Пока поколения не изменились, страница живет
+    timeout секунд; изменение любого поста ленты сразу меняет ключ.
+    Пересчет истекшей страницы защищен от одновременного запуска и
+    читает основную базу: отстающая реплика иначе положила бы старую
+    страницу под ключ нового поколения на весь timeout.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Ответ с flash-сообщением показывается один раз.
+            if request.method != 'GET' or 'messages' in request.COOKIES:
+                return view(request, *args, **kwargs)
+            versions = get_versions(*scopes(*args, **kwargs))
+            fingerprint = ','.join(
+                f'{scope}={version}'
+                for scope, version in sorted(versions.items())
+            )
+            # Под ASGI на странице есть скрипт живой ленты, под WSGI нет.
+            page = '{}|{}|{}|{}'.format(
+                fingerprint, request.user.pk or '', request.get_full_path(),
+                is_asgi(request))
+            key = '{}:{}'.format(
+                key_prefix, hashlib.md5(page.encode()).hexdigest())
+
+            def fill():
+                with primary_reads():
+                    return view(request, *args, **kwargs)
+
+            response, hit = get_or_compute(
+                key,
+                fill,
+                timeout,
+                cacheable=_cacheable_response,
+            )
+            PAGE_CACHE_REQUESTS.inc(key_prefix, 'hit' if hit else 'miss')
+            return response
+        return wrapper
+    return decorator
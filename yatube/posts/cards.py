@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_CACHE_TIMEOUT = getattr(settings, 'CARD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def card_key(post_id, updated):
+    return f'post_card:{post_id}:{updated.timestamp()}'
+
+
+def render_cards(posts):
+    """
+    Возвращает готовый HTML карточек постов в исходном порядке.
+
+    Карточки берутся из кеша одним get_many, промахи рендерятся пачкой
+    и сохраняются одним set_many. Ключ зависит от даты изменения поста,
+    поэтому правка поста делает неактуальной только его карточку.
+    """
+    posts = list(posts)
+    keys = [card_key(post.pk, post.updated) for post in posts]
+    cards = cache.get_many(keys)
+    missing = [
+        (key, post) for key, post in zip(keys, posts) if key not in cards
+    ]
+    if missing:
+        template = get_template(CARD_TEMPLATE)
+        rendered = {
+            key: template.render({'post': post}) for key, post in missing
+        }
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def forget_card(post_id, updated):
+    cache.delete(card_key(post_id, updated))
+
+
+def forget_cards(posts):
+    """Сбрасывает карточки пар (id, дата изменения) одним запросом."""
+    cache.delete_many([
+        card_key(post_id, updated) for post_id, updated in posts])
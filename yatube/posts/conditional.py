@@ -0,0 +1,109 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.asgi import is_asgi
+
+from .cache import author_scope, get_versions, group_scope
+from .models import Post
+
+# Сколько секунд общий кеш (reverse proxy, CDN) может отдавать
+# анонимную страницу без перепроверки.
+EDGE_MAX_AGE = getattr(settings, 'FEED_EDGE_MAX_AGE', 60)
+
+
+def _etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _skip(request):
+    # Страница с flash-сообщением уникальна и не должна отдаваться как 304.
+    return 'messages' in request.COOKIES
+
+
+def feed_etag(scopes):
+    """Валидатор ленты по ее поколениям: без запросов к базе."""
+    def etag(request, *args, **kwargs):
+        if _skip(request):
+            return None
+        versions = get_versions(*scopes(*args, **kwargs))
+        return _etag(
+            sorted(versions.items()),
+            request.user.pk,
+            request.get_full_path(),
+            is_asgi(request),
+        )
+    return etag
+
+
+def _post_state(request, post_id):
+    """Версии поста и его комментариев одним запросом, на весь запрос."""
+    cache = request.__dict__.setdefault('_post_state', {})
+    if post_id not in cache:
+        cache[post_id] = Post.objects.filter(pk=post_id).values(
+            'updated',
+            'comments_count',
+            'author__username',
+            'author__counters__posts_count',
+            'group__slug',
+        ).annotate(last_comment_id=Max('comments__id')).first()
+    return cache[post_id]
+
+
+def post_etag(request, post_id):
+    """
+    Валидатор поста: сам пост, его комментарии, автор и группа.
+
+    Удаление комментария меняет их число, а правки автора и группы
+    сдвигают поколения их лент. Last-Modified не отдается: по датам
+    эти изменения не видны.
+    """
+    state = _post_state(request, post_id)
+    if state is None or _skip(request):
+        return None
+    scopes = [author_scope(state['author__username'])]
+    if state['group__slug'] is not None:
+        scopes.append(group_scope(state['group__slug']))
+    return _etag(
+        sorted(state.items()),
+        sorted(get_versions(*scopes).items()),
+        request.user.pk,
+    )
+
+
+def comments_etag(request, post_id):
+    etag = post_etag(request, post_id)
+    return etag and _etag(etag, request.get_full_path())
+
+
+def conditional(etag_func, last_modified_func=None):
+    """
+    Условный GET и заголовки Cache-Control для страниц чтения.
+
+    Если валидатор клиента совпал, view не вызывается и отдается 304.
+    Анонимные страницы разрешено хранить общим кешам на EDGE_MAX_AGE
+    секунд, личные — только браузеру с обязательной перепроверкой.
+    """
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag_func,
+            last_modified_func=last_modified_func,
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=0,
+                    s_maxage=EDGE_MAX_AGE,
+                )
+            return response
+        return wrapper
+    return decorator
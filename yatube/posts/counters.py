@@ -0,0 +1,129 @@
+from django.db import router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+COUNTER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _count(queryset, field):
+    """Подзапрос COUNT(*) по связанной таблице для аннотации."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def actual_user_counters(users):
+    return users.annotate(
+        actual_posts=_count(Post.objects, 'author'),
+        actual_followers=_count(Follow.objects, 'author'),
+        actual_following=_count(Follow.objects, 'user'),
+    )
+
+
+def create_user_counters(user_id):
+    """Создает строку счетчиков, пересчитав значения с нуля."""
+    # Читаем там же, куда пишем: реплика может еще не знать
+    # ни пользователя, ни созданную строку.
+    database = router.db_for_write(UserCounters)
+    user = actual_user_counters(
+        User.objects.using(database).filter(pk=user_id)).first()
+    if user is None:
+        return None
+    counters, _ = UserCounters.objects.using(database).get_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': user.actual_posts,
+            'followers_count': user.actual_followers,
+            'following_count': user.actual_following,
+        },
+    )
+    return counters
+
+
+def user_counters(user):
+    """Счетчики пользователя; недостающая строка создается на лету."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        counters = create_user_counters(user.pk)
+        if counters is None:
+            raise
+        user.counters = counters
+        return counters
+
+
+def bump_user(user_id, **deltas):
+    """Атомарно сдвигает счетчики пользователя на deltas."""
+    # Условие не дает уйти в минус при рассинхроне: такие строки
+    # исправит команда recount_counters.
+    floors = {
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    }
+    updated = UserCounters.objects.filter(
+        user_id=user_id, **floors
+    ).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    # Строки нет: при увеличении считаем с нуля (новая запись уже
+    # в базе), при уменьшении пользователь, скорее всего, удаляется.
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        create_user_counters(user_id)
+
+
+def bump_comments(post_id, delta):
+    floor = {'comments_count__gte': -delta} if delta < 0 else {}
+    Post.objects.filter(pk=post_id, **floor).update(
+        comments_count=F('comments_count') + delta)
+
+
+def followers_count(author_id):
+    return UserCounters.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+
+
+def repair_user_counters(batch_size=500, dry_run=False):
+    """Пересчитывает счетчики пользователей, возвращает число исправлений."""
+    users = actual_user_counters(User.objects.select_related('counters'))
+    drifted, missing = [], []
+    for user in users.order_by('pk').iterator(chunk_size=batch_size):
+        actual = (
+            user.actual_posts, user.actual_followers, user.actual_following)
+        try:
+            counters = user.counters
+        except UserCounters.DoesNotExist:
+            missing.append(UserCounters(user=user, **dict(
+                zip(COUNTER_FIELDS, actual))))
+            continue
+        stored = tuple(getattr(counters, field) for field in COUNTER_FIELDS)
+        if stored != actual:
+            for field, value in zip(COUNTER_FIELDS, actual):
+                setattr(counters, field, value)
+            drifted.append(counters)
+    if not dry_run:
+        with transaction.atomic():
+            UserCounters.objects.bulk_create(
+                missing, batch_size=batch_size, ignore_conflicts=True)
+            UserCounters.objects.bulk_update(
+                drifted, COUNTER_FIELDS, batch_size=batch_size)
+    return len(drifted) + len(missing)
+
+
+def repair_post_counters(batch_size=500, dry_run=False):
+    """Пересчитывает comments_count постов, возвращает число исправлений."""
+    posts = Post.objects.annotate(
+        actual_comments=_count(Comment.objects, 'post'),
+    ).only('pk', 'comments_count')
+    drifted = []
+    for post in posts.order_by('pk').iterator(chunk_size=batch_size):
+        if post.comments_count != post.actual_comments:
+            post.comments_count = post.actual_comments
+            drifted.append(post)
+    if not dry_run:
+        with transaction.atomic():
+            Post.objects.bulk_update(
+                drifted, ['comments_count'], batch_size=batch_size)
+    return len(drifted)
@@ -0,0 +1,240 @@
+"""
+Шина событий внутри процесса для живых лент (Server-Sent Events).
+
+Сигналы публикуют новые посты и комментарии в каналы, открытые
+потоки SSE подписаны на нужные каналы. Шина хранит последние события
+всех каналов, чтобы переподключившийся клиент получил пропущенное по
+Last-Event-ID. События не выходят за пределы процесса: клиент другого
+воркера узнает о новом посте после перезагрузки страницы.
+
+Номера событий — счетчик этого процесса, после перезапуска он
+начинается заново. Поэтому Last-Event-ID, выданный до перезапуска или
+другим воркером, указывает на чужие события. Номер новее последнего
+события шины или старше ее истории считается неизвестным, и клиент
+вместо повтора получает reset. Номер, случайно попавший в текущую
+историю, повторит не те события. Это безвредно: по событию клиент
+только подгружает свежие карточки.
+
+Потоки отдаются только под ASGI, из цикла событий (astream), и потоков
+не занимают. Под WSGI каждый поток держал бы воркер, поэтому view
+отвечает 204, а страницы не открывают EventSource. Число потоков
+ограничено MAX_STREAMS.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+
+from django.conf import settings
+from django.db import connection
+
+# Сколько последних событий всех каналов хранится для переподключений.
+HISTORY = 1000
+# Очередь подписчика; переполнение значит, что клиент не успевает.
+QUEUE_SIZE = 100
+HEARTBEAT = getattr(settings, 'SSE_HEARTBEAT', 15)
+# Поток не держит воркер бесконечно: браузер сам переподключится.
+STREAM_SECONDS = getattr(settings, 'SSE_STREAM_SECONDS', 300)
+RETRY_MS = 5000
+MAX_STREAMS = getattr(settings, 'SSE_MAX_STREAMS', 100)
+
+Event = namedtuple('Event', 'id channel name data')
+
+
+def index_channel():
+    return 'index'
+
+
+def group_channel(group_id):
+    return f'group:{group_id}'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def post_channel(post_id):
+    return f'post:{post_id}'
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, bus, channels):
+        self.bus = bus
+        self.channels = tuple(channels)
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.overflowed = False
+        self.closed = False
+        # Вызывается из потока публикующего: будит astream.
+        self.wakeup = None
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+        if self.wakeup is not None:
+            self.wakeup()
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class Bus:
+    def __init__(self, history=HISTORY, max_streams=None):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._subscribers = defaultdict(set)
+        self._history = deque(maxlen=history)
+        self._last_id = 0
+        self._streams = 0
+        self.max_streams = max_streams
+
+    def publish(self, channel, name, data):
+        with self._lock:
+            event = Event(next(self._ids), channel, name, data)
+            self._last_id = event.id
+            self._history.append(event)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        return event
+
+    def _is_known(self, last_id):
+        # Номер другого процесса или вытесненный из истории: пропущенное
+        # не восстановить.
+        oldest = self._history[0].id if self._history else self._last_id + 1
+        return oldest - 1 <= last_id <= self._last_id
+
+    def subscribe(self, channels, last_id=None):
+        """Подписка на каналы; с last_id — вместе с пропущенным."""
+        subscription = Subscription(self, channels)
+        with self._lock:
+            if self.max_streams is not None and (
+                    self._streams >= self.max_streams):
+                raise TooManyStreams
+            self._streams += 1
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+            if last_id is not None and not self._is_known(last_id):
+                subscription.overflowed = True
+            missed = [] if last_id is None else [
+                event for event in self._history
+                if event.id > last_id
+                and event.channel in subscription.channels
+            ]
+        for event in missed:
+            subscription.put(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            self._streams -= 1
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+bus = Bus(max_streams=MAX_STREAMS)
+
+
+def publish_post(post_id, author_id, group_id):
+    channels = [index_channel(), author_channel(author_id)]
+    if group_id is not None:
+        channels.append(group_channel(group_id))
+    for channel in channels:
+        bus.publish(channel, 'post', {'id': post_id})
+
+
+def publish_comment(comment_id, post_id):
+    bus.publish(post_channel(post_id), 'comment', {'id': comment_id})
+
+
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+def _format(event):
+    data = json.dumps(event.data, ensure_ascii=False)
+    return f'id: {event.id}\nevent: {event.name}\ndata: {data}\n\n'
+
+
+def _chunk(subscription, event):
+    """Очередной кусок потока; None — поток пора закрыть."""
+    if subscription.overflowed:
+        # Пропущенное не восстановить: клиент перезагрузит ленту.
+        return None
+    # Комментарий SSE держит соединение живым через прокси.
+    return ': ping\n\n' if event is None else _format(event)
+
+
+def stream(subscription, heartbeat=HEARTBEAT, duration=STREAM_SECONDS):
+    """Текст потока SSE; подписка закрывается вместе с потоком."""
+    # Поток живет минутами: соединение с БД ему больше не нужно.
+    if not connection.in_atomic_block:
+        connection.close()
+    deadline = time.monotonic() + duration
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            chunk = _chunk(
+                subscription, subscription.get(min(heartbeat, remaining)))
+            if chunk is None:
+                yield RESET
+                return
+            yield chunk
+    finally:
+        subscription.close()
+
+
+async def astream(subscription, heartbeat=HEARTBEAT,
+                  duration=STREAM_SECONDS):
+    """То же, что stream, но ожидание событий не занимает поток."""
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    subscription.wakeup = lambda: loop.call_soon_threadsafe(ready.set)
+    deadline = loop.time() + duration
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            # Флаг сбрасывается до проверки очереди, чтобы не потерять
+            # событие, пришедшее между ними.
+            ready.clear()
+            event = subscription.get(0)
+            if event is None and not subscription.overflowed:
+                try:
+                    await asyncio.wait_for(
+                        ready.wait(), min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                event = subscription.get(0)
+            chunk = _chunk(subscription, event)
+            if chunk is None:
+                yield RESET
+                return
+            yield chunk
+    finally:
+        subscription.close()
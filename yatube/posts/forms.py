@@ -1,5 +1,6 @@
 from django import forms
 
+from .export import FORMATS
 from .models import Post, Comment
 
 
@@ -32,3 +33,13 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Введите текст вашего комментария',
         }
+
+
+class ExportForm(forms.Form):
+    """Фильтры выгрузки постов и комментариев."""
+    format = forms.ChoiceField(
+        choices=[(name, name) for name in FORMATS], required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    group = forms.SlugField(required=False)
+    author = forms.CharField(required=False)
@@ -0,0 +1,333 @@
+"""
+Потоковый импорт дампов dumpdata в формате JSON-массива или JSON Lines.
+
+В отличие от loaddata файл не читается в память целиком: записи
+разбираются по одной, копятся по моделям и вставляются через
+bulk_create. Сигналы при этом не срабатывают, поэтому ленты и поисковый
+индекс дополняются после каждой пачки, а счетчики и кеш страниц
+обновляются в конце. Уже существующие строки (по первичному ключу или
+уникальным полям) пропускаются, так что повторный импорт той же пачки
+безопасен.
+"""
+import json
+import os
+import re
+from collections import Counter
+
+from django.db import connection
+from django.utils import timezone
+
+from . import cache, search, timeline
+from .bulk import keep_auto_now
+from .models import Comment, Follow, Group, Post, TimelineEntry, User
+
+READ_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,\[\]]*')
+# Строки JSON (незакрытая обрывается переводом строки), скобки и начало
+# строки файла с новой записи.
+RECORD_TOKENS = re.compile(r'"(?:[^"\\\n]|\\.)*"?|\n(?=\{)|[{}\[\]]')
+
+# Порядок важен: родительские записи вставляются раньше ссылок на них.
+MODELS = {
+    'auth.user': User,
+    'posts.group': Group,
+    'posts.post': Post,
+    'posts.comment': Comment,
+    'posts.follow': Follow,
+}
+# Составные индексы, которые можно отложить до конца импорта.
+DEFERRED_INDEX_MODELS = (Post, Comment, TimelineEntry)
+
+
+def _record_end(buffer, start):
+    """
+    Конец битой записи, начатой в start, или -1, если он еще не прочитан.
+
+    Граница — скобка, закрывающая запись верхнего уровня (скобки внутри
+    строк не считаются), или начало строки с «{»: так начинаются записи
+    JSON Lines и dumpdata --indent. Перевод строки внутри строки JSON
+    невозможен, поэтому незакрытая кавычка тянется только до конца строки.
+    """
+    depth = 0
+    for match in RECORD_TOKENS.finditer(buffer, start):
+        token = match.group()
+        if token == '\n':
+            return match.end()
+        if token in ('{', '['):
+            depth += 1
+        elif token in ('}', ']'):
+            depth -= 1
+            if depth <= 0:
+                return match.end()
+    return -1
+
+
+def iter_records(file, read_size=READ_SIZE, on_error=None):
+    """
+    Разбирает объекты JSON из файла по одному.
+
+    Подходит и для массива [{...}, {...}], и для объектов по строке:
+    между записями пропускаются пробелы, запятые и скобки массива.
+    Битая запись не дочитывает файл в память: если передан on_error,
+    он получает сообщение, а разбор продолжается со следующей записи
+    верхнего уровня, иначе сразу поднимается ValueError.
+    """
+    def fail(message):
+        if on_error is None:
+            raise ValueError(message)
+        on_error(message)
+
+    decoder = json.JSONDecoder()
+    buffer, position, offset, eof = '', 0, 0, False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            # Запись, обрезанная концом буфера, ломается без границы
+            # следующей: тогда дочитываем файл, иначе данные битые.
+            end = _record_end(buffer, position)
+            if end == -1 and eof and buffer[position:].strip():
+                end = len(buffer)
+            if end != -1:
+                fail(f'Некорректный JSON около символа {offset + error.pos}')
+                position = end
+                continue
+            if eof:
+                return
+            chunk = file.read(read_size)
+            eof = not chunk
+            offset += position
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        if not isinstance(record, dict) or 'model' not in record:
+            fail(f'Запись без поля model: {record!r:.80}')
+            continue
+        yield record
+
+
+def _reference_key(value):
+    # Естественный ключ приходит списком: ["leo"] вместо 2.
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _resolve(field, values):
+    """Ключи из дампа, которые уже есть в базе, и их первичные ключи."""
+    model = field.related_model
+    ids = {value for value in values if not isinstance(value, list)}
+    found = {
+        pk: pk for pk in model.objects.filter(
+            pk__in=ids).values_list('pk', flat=True)
+    }
+    names = {value[0] for value in values if isinstance(value, list)}
+    if names and model is User:
+        found.update(
+            ((username,), pk) for username, pk in User.objects.filter(
+                username__in=names).values_list('username', 'pk')
+        )
+    return found
+
+
+class Importer:
+    """Копит записи по моделям и сбрасывает их в базу пачками."""
+
+    def __init__(self, batch_size=1000, pending=(), authors=(), groups=()):
+        self.batch_size = batch_size
+        self.buffers = {model: [] for model in MODELS.values()}
+        # Записи со ссылками на еще не импортированные объекты.
+        self.pending = list(pending)
+        # Пользователи и группы, чьи закешированные ленты устарели.
+        self.authors = set(authors)
+        self.groups = set(groups)
+        self.stats = Counter()
+        self.now = timezone.now()
+
+    def add(self, record):
+        model = MODELS.get(record['model'])
+        if model is None:
+            self.stats[f'пропущено {record["model"]}'] += 1
+            return
+        self.buffers[model].append(record)
+
+    def flush(self):
+        for model, records in self.buffers.items():
+            if records:
+                self.insert(model, records)
+                records.clear()
+
+    def retry_pending(self):
+        """Повторяет отложенные записи; неразрешимые возвращает."""
+        pending, self.pending = self.pending, []
+        for record in pending:
+            self.add(record)
+        self.flush()
+        return self.pending
+
+    def insert(self, model, records):
+        relations = [
+            field for field in model._meta.concrete_fields
+            if field.is_relation
+        ]
+        references = {
+            field.name: _resolve(field, [
+                record['fields'][field.name] for record in records
+                if record['fields'].get(field.name) is not None
+            ])
+            for field in relations
+        }
+        objects = []
+        for record in records:
+            obj = self.build(model, record, references)
+            if obj is None:
+                self.pending.append(record)
+            else:
+                objects.append(obj)
+        auto_fields = [
+            field.name for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)
+        ]
+        # ignore_conflicts молча пропускает дубликаты: вставленными
+        # считаются ключи, которых не было до пачки и которые есть после.
+        ids = {obj.pk for obj in objects if obj.pk is not None}
+        existing = set(model.objects.filter(
+            pk__in=ids).values_list('pk', flat=True))
+        with keep_auto_now(model, *auto_fields):
+            model.objects.bulk_create(
+                objects, batch_size=self.batch_size, ignore_conflicts=True)
+        created = set(model.objects.filter(
+            pk__in=ids - existing).values_list('pk', flat=True))
+        inserted = [obj for obj in objects if obj.pk in created]
+        # Записи без pk (естественные ключи) считаются отправленными.
+        self.stats[model._meta.label_lower] += (
+            len(inserted) + len(objects) - len(ids))
+        self.derive(model, inserted)
+
+    def build(self, model, record, references):
+        """Экземпляр модели из записи или None, если ссылка не найдена."""
+        fields = record['fields']
+        values = {}
+        for field in model._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            if field.name not in fields:
+                if getattr(field, 'auto_now', False) or getattr(
+                        field, 'auto_now_add', False):
+                    values[field.attname] = self.now
+                continue
+            value = fields[field.name]
+            if field.is_relation and value is not None:
+                value = references[field.name].get(_reference_key(value))
+                if value is None:
+                    return None
+            elif not field.is_relation:
+                value = field.to_python(value)
+            values[field.attname] = value
+        return model(pk=record.get('pk'), **values)
+
+    def derive(self, model, objects):
+        """То, что при обычном сохранении делают сигналы, для новых строк."""
+        if model is Post and objects:
+            self.authors.update(post.author_id for post in objects)
+            self.groups.update(
+                post.group_id for post in objects if post.group_id)
+            search.index_posts((post.pk, post.text) for post in objects)
+            follows = Follow.objects.filter(
+                author_id__in={post.author_id for post in objects})
+            timeline.fill(
+                follows.values_list('user_id', 'author_id').iterator(),
+                Post.objects.filter(pk__in=[post.pk for post in objects]),
+            )
+        elif model is Follow and objects:
+            # В профилях обеих сторон показано число подписок.
+            for follow in objects:
+                self.authors.update((follow.user_id, follow.author_id))
+            timeline.fill(
+                (follow.user_id, follow.author_id) for follow in objects)
+
+    def bump_feeds(self):
+        """Сдвигает поколения главной и лент затронутых авторов и групп."""
+        scopes = [cache.index_scope()]
+        for model, ids, field, scope in (
+            (User, self.authors, 'username', cache.author_scope),
+            (Group, self.groups, 'slug', cache.group_scope),
+        ):
+            ids = sorted(ids)
+            for start in range(0, len(ids), self.batch_size):
+                scopes.extend(map(scope, model.objects.filter(
+                    pk__in=ids[start:start + self.batch_size],
+                ).values_list(field, flat=True)))
+        cache.bump(*scopes)
+
+
+def _index_names(model):
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(
+            cursor, model._meta.db_table))
+
+
+def drop_indexes(models=DEFERRED_INDEX_MODELS):
+    """Удаляет составные индексы перед массовой вставкой."""
+    with connection.schema_editor() as editor:
+        for model in models:
+            existing = _index_names(model)
+            for index in model._meta.indexes:
+                if index.name in existing:
+                    editor.remove_index(model, index)
+
+
+def restore_indexes(models=DEFERRED_INDEX_MODELS):
+    """Строит недостающие составные индексы одним проходом по таблице."""
+    with connection.schema_editor() as editor:
+        for model in models:
+            existing = _index_names(model)
+            for index in model._meta.indexes:
+                if index.name not in existing:
+                    editor.add_index(model, index)
+
+
+class Checkpoint:
+    """
+    Состояние прерванного импорта в JSON-файле рядом с дампом.
+
+    Хранит число уже закоммиченных записей, отложенные записи и
+    затронутых авторов и группы, чтобы после сбоя продолжить с места
+    остановки и в конце сбросить кеш всех их лент.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self.pending = []
+        self.authors = []
+        self.groups = []
+        self.deferred_indexes = False
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as file:
+            state = json.load(file)
+        self.records = state['records']
+        self.pending = state['pending']
+        self.authors = state.get('authors', [])
+        self.groups = state.get('groups', [])
+        self.deferred_indexes = state['deferred_indexes']
+
+    def save(self):
+        # Запись через временный файл: сбой не оставит половину JSON.
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({
+                'records': self.records,
+                'pending': self.pending,
+                'authors': self.authors,
+                'groups': self.groups,
+                'deferred_indexes': self.deferred_indexes,
+            }, file, ensure_ascii=False)
+        os.replace(temporary, self.path)
+
+    def delete(self):
+        if self.exists():
+            os.remove(self.path)
@@ -0,0 +1,217 @@
+import json
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+# Число SQL-запросов берется из Server-Timing от QueryBudgetMiddleware;
+# на время прогона заголовок включается для всех.
+QUERIES = re.compile(r'desc="(\d+) queries"')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * rank // 100) - 1)
+    return ordered[index]
+
+
+class ClientDriver:
+    """Запросы через тестовый клиент, без сети и сервера."""
+
+    def __init__(self, user):
+        self.client = Client(HTTP_HOST='localhost')
+        if user is not None:
+            self.client.force_login(user)
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get('Server-Timing', '')
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class WSGIDriver:
+    """Запросы по HTTP к локальному WSGI-серверу в отдельном потоке."""
+
+    def __init__(self, user):
+        self.server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            handler_class=_QuietHandler,
+        )
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.headers = {}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            self.headers['Cookie'] = (
+                f'{settings.SESSION_COOKIE_NAME}={session}')
+
+    def get(self, path):
+        request = urllib.request.Request(
+            self.base + path, headers=self.headers)
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            return response.status, response.headers.get('Server-Timing', '')
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DRIVERS = {'client': ClientDriver, 'wsgi': WSGIDriver}
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные страницы через тестовый клиент или локальный '
+        'WSGI-сервер и печатает p50/p95/p99 и число SQL-запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=DRIVERS, default='client')
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Число замеряемых запросов к каждой странице',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Число запросов без замера перед прогоном',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести отчет в JSON')
+        parser.add_argument(
+            '--baseline',
+            help='Отчет прошлого прогона в JSON для сравнения p95',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 относительно baseline',
+        )
+
+    def handle(self, *args, **options):
+        reader = self.reader()
+        targets = self.targets(reader)
+        driver = DRIVERS[options['mode']](reader)
+        try:
+            with override_settings(SERVER_TIMING=True):
+                report = {
+                    name: self.measure(driver, path, options)
+                    for name, path in targets.items()
+                }
+        finally:
+            driver.close()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def reader(self):
+        follow = Follow.objects.values('user').annotate(
+            total=Count('pk')).order_by('-total').first()
+        if follow is None:
+            return None
+        return User.objects.get(pk=follow['user'])
+
+    def targets(self, reader):
+        """Самые нагруженные страницы: так хвост латентности виднее."""
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        if post is None:
+            raise CommandError('Нет данных: сначала выполните generate_data')
+        targets = {
+            'index': reverse('posts:index'),
+            'profile': reverse(
+                'posts:profile',
+                args=[User.objects.order_by(
+                    '-counters__posts_count').first().username],
+            ),
+            'post_detail': reverse('posts:post_detail', args=[post.pk]),
+            'post_comments': reverse('posts:post_comments', args=[post.pk]),
+            'search': '{}?q={}'.format(
+                reverse('posts:search'),
+                urllib.parse.quote(post.text.split()[0]),
+            ),
+        }
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        if group is not None:
+            targets['group_posts'] = reverse(
+                'posts:group_posts', args=[group.slug])
+        if reader is not None:
+            targets['follow_index'] = reverse('posts:follow_index')
+        return targets
+
+    def measure(self, driver, path, options):
+        for _ in range(options['warmup']):
+            driver.get(path)
+        timings, queries = [], []
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            started = time.perf_counter()
+            status, server_timing = driver.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                raise CommandError(f'{path}: статус {status}')
+            match = QUERIES.search(server_timing)
+            queries.append(int(match[1]) if match else 0)
+        result = {
+            f'p{rank}_ms': round(percentile(timings, rank), 2)
+            for rank in PERCENTILES
+        }
+        result['queries'] = round(sum(queries) / len(queries), 1)
+        return result
+
+    def print_report(self, report):
+        header = ''.join(f'{f"p{rank}, мс":>10}' for rank in PERCENTILES)
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(f'{"":<16}{header}{"запросов":>10}'))
+        for name, result in report.items():
+            values = ''.join(
+                f'{result[f"p{rank}_ms"]:>10.2f}' for rank in PERCENTILES)
+            self.stdout.write(
+                f'{name:<16}{values}{result["queries"]:>10.1f}')
+
+    def compare(self, report, path, tolerance):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = [
+            f'{name}: p95 {result["p95_ms"]} мс против '
+            f'{baseline[name]["p95_ms"]} мс'
+            for name, result in report.items()
+            if name in baseline
+            and result['p95_ms'] > baseline[name]['p95_ms'] * (1 + tolerance)
+        ]
+        if regressions:
+            raise CommandError(
+                'Регрессия латентности:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий p95 нет.'))
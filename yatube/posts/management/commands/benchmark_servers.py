@@ -0,0 +1,147 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+from core.asgi import ASGIHandler, build_environ
+
+from .benchmark import PERCENTILES, percentile
+
+
+class InFlight:
+    """Число одновременно обслуживаемых запросов и его пик."""
+
+    def __init__(self):
+        self.current = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.current -= 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI и ASGI при медленных клиентах: одинаковое число '
+        'потоков, одинаковая задержка отправки ответа клиенту. Печатает '
+        'пропускную способность, p50/p95/p99 и пик одновременных запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument(
+            '--clients', type=int, default=50,
+            help='Сколько клиентов шлют запросы одновременно',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=500, help='Всего запросов')
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Воркеры WSGI и размер пула потоков ASGI',
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=0.05,
+            help='Сколько секунд медленный клиент принимает ответ',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{"":<6}{"запр/с":>10}'
+            + ''.join(f'{f"p{rank}, мс":>10}' for rank in PERCENTILES)
+            + f'{"одновр.":>10}'
+        ))
+        for name, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+            in_flight = InFlight()
+            started = time.perf_counter()
+            timings = run(in_flight)
+            elapsed = time.perf_counter() - started
+            values = ''.join(
+                f'{percentile(timings, rank) * 1000:>10.1f}'
+                for rank in PERCENTILES
+            )
+            self.stdout.write(
+                f'{name:<6}{len(timings) / elapsed:>10.1f}{values}'
+                f'{in_flight.peak:>10}'
+            )
+
+    def scope(self):
+        path, _, query = self.options['path'].partition('?')
+        return {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': query.encode(),
+            'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80),
+        }
+
+    def run_wsgi(self, in_flight):
+        """Синхронный воркер занят, пока клиент не примет ответ."""
+        handler = WSGIHandler()
+        delay = self.options['client_delay']
+
+        def serve():
+            with in_flight:
+                environ = build_environ(self.scope(), io.BytesIO())
+                response = handler(environ, lambda status, headers: None)
+                b''.join(response)
+                response.close()
+                time.sleep(delay)
+
+        workers = ThreadPoolExecutor(self.options['threads'])
+
+        def client():
+            started = time.perf_counter()
+            workers.submit(serve).result()
+            return time.perf_counter() - started
+
+        with workers, ThreadPoolExecutor(self.options['clients']) as pool:
+            return list(pool.map(
+                lambda _: client(), range(self.options['requests'])))
+
+    def run_asgi(self, in_flight):
+        """Поток занят только на время view, отправка идет в цикле."""
+        handler = ASGIHandler(threads=self.options['threads'])
+        delay = self.options['client_delay']
+        timings = []
+
+        async def receive():
+            return {'type': 'http.request'}
+
+        async def send(message):
+            if message['type'] == 'http.response.body' and not message.get(
+                    'more_body'):
+                await asyncio.sleep(delay)
+
+        async def request():
+            started = time.perf_counter()
+            with in_flight:
+                await handler(self.scope(), receive, send)
+            timings.append(time.perf_counter() - started)
+
+        async def client(count):
+            for _ in range(count):
+                await request()
+
+        async def main():
+            clients = self.options['clients']
+            share, extra = divmod(self.options['requests'], clients)
+            await asyncio.gather(*(
+                client(share + (index < extra)) for index in range(clients)
+            ))
+
+        try:
+            asyncio.run(main())
+        finally:
+            handler.executor.shutdown()
+        return timings
@@ -0,0 +1,110 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts import synthetic, timeline
+from posts.models import Comment, Follow, Post, TimelineEntry
+
+# Уникальное ограничение Follow не удаляется: в SQLite оно живет внутри
+# таблицы, а поиск по (user, author) без него идет по индексу user_id.
+FEED_INDEXES = (
+    'post_pub_date_idx',
+    'post_group_pub_date_idx',
+    'post_author_pub_date_idx',
+    'comment_post_created_idx',
+)
+PAGE = 10
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время запросов лент на синтетических данных '
+        'с составными индексами и без них. Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос для замера',
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Синтетические данные и схема откачены.')
+
+    def run(self, options):
+        self.stdout.write('Генерация синтетических данных...')
+        user_ids, group_ids, post_ids = synthetic.generate(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+        )
+        reader_id = Follow.objects.filter(
+            user_id__in=user_ids).values_list('user_id', flat=True).first()
+        timeline.rebuild(reader_id)
+        follow = Follow.objects.filter(user_id=reader_id).first()
+        middle = Post.objects.order_by('-pub_date').values_list(
+            'pub_date', 'pk')[len(post_ids) // 2]
+        queries = {
+            'index': Post.objects.order_by('-pub_date', '-id'),
+            'index, keyset-страница из середины': Post.objects.filter(
+                pub_date__lte=middle[0]).order_by('-pub_date', '-id'),
+            'group_posts': Post.objects.filter(group_id=group_ids[0]),
+            'profile': Post.objects.filter(author_id=follow.author_id),
+            'follow_index': Post.objects.filter(
+                timeline_entries__user_id=reader_id
+            ).order_by('-timeline_entries__pub_date'),
+            'post_detail, комментарии': Comment.objects.filter(
+                post_id=post_ids[0]),
+            'profile, проверка подписки': Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id),
+        }
+        self.report('С составными индексами', queries)
+        with connection.cursor() as cursor:
+            for name in FEED_INDEXES:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        self.report('Без составных индексов', queries)
+        self.stdout.write(
+            f'Записей в ленте читателя: '
+            f'{TimelineEntry.objects.filter(user_id=reader_id).count()}'
+        )
+
+    def report(self, title, queries):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            page = queryset[:PAGE]
+            started = time.perf_counter()
+            for _ in range(self.repeat):
+                list(page)
+            elapsed = (time.perf_counter() - started) / self.repeat * 1000
+            self.stdout.write(self.style.SUCCESS(f'{name}: {elapsed:.2f} мс'))
+            self.stdout.write(self.explain(page, title))
+
+    def explain(self, queryset, title):
+        # Комментарий с заголовком делает текст запроса уникальным: иначе
+        # sqlite3 отдаст из кеша план, подготовленный до удаления индексов.
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql} /* {title} */', params)
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
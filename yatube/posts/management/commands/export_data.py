@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты или комментарии в JSON Lines или CSV '
+        'без загрузки таблицы в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=export.COLUMNS)
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='jsonl')
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout')
+        parser.add_argument(
+            '--from', dest='date_from', type=date.fromisoformat,
+            help='Начальная дата, ГГГГ-ММ-ДД',
+        )
+        parser.add_argument(
+            '--to', dest='date_to', type=date.fromisoformat,
+            help='Конечная дата включительно, ГГГГ-ММ-ДД',
+        )
+        parser.add_argument('--group', help='Слаг группы')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        rows = export.queryset(
+            kind,
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+            group=options['group'],
+            author=options['author'],
+        )
+        render_rows, _ = export.FORMATS[options['format']]
+        lines = render_rows(kind, rows, options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as file:
+                file.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.models import Post
+from posts.thumbnails import generate_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит миниатюры и адаптивные варианты картинок постов, '
+        'у которых их еще нет'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Сколько картинок готовить параллельно',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            Q(thumbnail='') | Q(image_variants='')).values_list('pk', 'image')
+        done = generate_many(list(posts), workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'Готово миниатюр: {done}'))
@@ -0,0 +1,117 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import importer
+from posts.counters import repair_post_counters, repair_user_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует дамп dumpdata (JSON или JSON Lines) '
+        'пачками bulk_create с возможностью продолжить после сбоя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл дампа')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер одного INSERT',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Записей в одной транзакции и между контрольными точками',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки; по умолчанию <path>.checkpoint',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить импорт с последней контрольной точки',
+        )
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Удалить составные индексы на время импорта',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = importer.Checkpoint(
+            options['checkpoint'] or f'{options["path"]}.checkpoint')
+        if options['resume']:
+            if not checkpoint.exists():
+                raise CommandError('Контрольная точка не найдена')
+            checkpoint.load()
+            self.stdout.write(
+                f'Продолжение с записи {checkpoint.records + 1}')
+        elif checkpoint.exists():
+            raise CommandError(
+                f'Есть незавершенный импорт ({checkpoint.path}): '
+                f'запустите с --resume или удалите файл'
+            )
+        self.checkpoint = checkpoint
+        self.importer = importer.Importer(
+            options['batch_size'], checkpoint.pending,
+            checkpoint.authors, checkpoint.groups)
+        self.started = time.perf_counter()
+        if options['defer_indexes'] and not checkpoint.deferred_indexes:
+            importer.drop_indexes()
+            checkpoint.deferred_indexes = True
+            checkpoint.save()
+        try:
+            self.load(options['path'], options['chunk_size'])
+        except ValueError as error:
+            raise CommandError(f'{options["path"]}: {error}')
+        self.finish()
+
+    def load(self, path, chunk_size):
+        skip = self.checkpoint.records
+        number = skip
+        with open(path, encoding='utf-8') as file:
+            records = importer.iter_records(file, on_error=self.skip)
+            for number, record in enumerate(records, start=1):
+                if number <= skip:
+                    continue
+                self.importer.add(record)
+                if number % chunk_size == 0:
+                    self.commit(number)
+        self.commit(number)
+
+    def skip(self, message):
+        self.importer.stats['пропущено битых записей'] += 1
+        self.stderr.write(self.style.WARNING(f'Пропущено: {message}'))
+
+    def commit(self, number):
+        with transaction.atomic():
+            self.importer.flush()
+        # Точка пишется после коммита: если процесс упадет между ними,
+        # пачка импортируется повторно, а дубликаты будут пропущены.
+        self.checkpoint.records = number
+        self.checkpoint.pending = self.importer.pending
+        self.checkpoint.authors = sorted(self.importer.authors)
+        self.checkpoint.groups = sorted(self.importer.groups)
+        self.checkpoint.save()
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f'Обработано записей: {number} ({elapsed:.1f} с)')
+
+    def finish(self):
+        with transaction.atomic():
+            unresolved = self.importer.retry_pending()
+        if self.checkpoint.deferred_indexes:
+            self.stdout.write('Построение отложенных индексов...')
+            importer.restore_indexes()
+        self.stdout.write('Пересчет счетчиков...')
+        repair_user_counters()
+        repair_post_counters()
+        self.importer.bump_feeds()
+        self.checkpoint.delete()
+        for label, count in sorted(self.importer.stats.items()):
+            self.stdout.write(f'{label}: {count}')
+        for label, count in sorted(Counter(
+                record['model'] for record in unresolved).items()):
+            self.stdout.write(self.style.WARNING(
+                f'{label}: ссылки не найдены у {count} записей'))
+        self.stdout.write(self.style.SUCCESS('Импорт завершен.'))
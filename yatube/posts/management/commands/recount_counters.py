@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair_post_counters, repair_user_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики и исправляет рассинхрон'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Размер пачки при чтении и обновлении строк',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число расхождений',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        users = repair_user_counters(batch_size, dry_run)
+        posts = repair_post_counters(batch_size, dry_run)
+        verb = 'Найдено' if dry_run else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} расхождений: пользователи — {users}, посты — {posts}'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.CharField(blank=True, editable=False, help_text='Адрес готовой миниатюры картинки', max_length=255, verbose_name='Миниатюра'),
+        ),
+    ]
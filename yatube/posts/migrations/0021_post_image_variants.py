@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, help_text='JSON с размерами и форматами картинки для srcset', verbose_name='Варианты картинки'),
+        ),
+    ]
@@ -1,10 +1,15 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.functional import cached_property
+
+from .variants import parse as parse_variants
 
 User = get_user_model()
 
 
 class Post(models.Model):
+    COUNTER_FIELDS = ('comments_count',)
+
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -12,6 +17,9 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True)
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -32,15 +40,93 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    thumbnail = models.CharField(
+        'Миниатюра',
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text='Адрес готовой миниатюры картинки',
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON с размерами и форматами картинки для srcset',
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_counters()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        self._remember_counters()
+
+    def _remember_counters(self):
+        self._loaded_counters = {
+            name: self.__dict__[name] for name in self.COUNTER_FIELDS
+            if name in self.__dict__
+        }
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """
+        Полное сохранение пропускает счетчики, не тронутые в экземпляре.
+
+        Счетчики меняются через F(): значение, прочитанное раньше, в базе
+        уже могло устареть, и сохранение формы или админки затерло бы
+        его. Счетчик, явно измененный в экземпляре, сохраняется.
+        """
+        if not self._state.adding and not force_insert \
+                and update_fields is None:
+            deferred = self.get_deferred_fields()
+            loaded = getattr(self, '_loaded_counters', {})
+            untouched = {
+                name for name in self.COUNTER_FIELDS
+                if name not in loaded or loaded[name] == getattr(self, name)
+            }
+            update_fields = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in untouched
+                and field.attname not in deferred
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+        self._remember_counters()
+
+    @cached_property
+    def variants(self):
+        return parse_variants(self.image_variants)
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -85,6 +171,17 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx',
+            ),
+            models.Index(
+                # Админка добавляет -pk к сортировке для однозначности.
+                fields=['-created', '-id'],
+                name='comment_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -98,3 +195,64 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE,
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
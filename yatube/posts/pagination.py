@@ -0,0 +1,181 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+
+def encode_cursor(values, reverse=False):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    payload = json.dumps(
+        {'v': values, 'r': int(reverse)},
+        separators=(',', ':'),
+        default=str,
+    )
+    token = base64.urlsafe_b64encode(payload.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (values, reverse) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(payload['v']), bool(payload['r'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+
+
+class CursorPage:
+    """Страница keyset-пагинации, совместимая по интерфейсу с Page."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, cursor, has_next, has_previous,
+                 next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по упорядоченному набору полей.
+
+    Вместо OFFSET и COUNT(*) страница выбирается условием
+    «строго после последней записи», поэтому стоимость запроса не зависит
+    от номера страницы. Последнее поле ordering должно быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def _to_python(self, values):
+        model = self.object_list.model
+        return [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(self.fields, values)
+        ]
+
+    def _after(self, values, reverse):
+        """Условие «строго после values» в заданном направлении обхода."""
+        condition = Q()
+        for position, name in enumerate(self.fields):
+            descending = self.ordering[position].startswith('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            for prev_name, prev_value in zip(self.fields, values[:position]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def _key(self, obj):
+        # Строки values() — словари: сериализация без создания моделей.
+        if isinstance(obj, dict):
+            return [obj[name] for name in self.fields]
+        return [getattr(obj, name) for name in self.fields]
+
+    def get_page(self, token):
+        decoded = decode_cursor(token)
+        values, reverse = decoded if decoded else (None, False)
+        if values is not None and len(values) != len(self.fields):
+            values, reverse = None, False
+        queryset = self.object_list
+        if values is not None:
+            try:
+                values = self._to_python(values)
+            # Подделанный курсор может нести списки и словари вместо
+            # чисел и дат: to_python падает на них с TypeError.
+            except (ValidationError, TypeError, ValueError):
+                values, reverse = None, False
+            else:
+                queryset = queryset.filter(self._after(values, reverse))
+        ordering = self._reversed_ordering() if reverse else self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse and not rows:
+            return self.get_page(None)
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(self._key(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(self._key(rows[0]), reverse=True)
+        return CursorPage(
+            rows,
+            cursor=token if values is not None else None,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+        )
+
+
+class KeysetPaginator(Paginator):
+    """
+    Paginator для лент: страница выбирается курсором, без OFFSET и COUNT(*).
+
+    get_page возвращает обычный Page, чтобы шаблоны и код, ждущие Page,
+    работали без изменений. Общее число страниц неизвестно, поэтому
+    number и num_pages подобраны так, чтобы has_next и has_previous
+    отвечали как у курсора; page() с номером остается для старых
+    ссылок ?page=.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.cursor_paginator = CursorPaginator(
+            object_list, per_page, ordering)
+
+    def get_page(self, token):
+        cursor_page = self.cursor_paginator.get_page(token)
+        number = 2 if cursor_page.has_previous() else 1
+        self.num_pages = number + 1 if cursor_page.has_next() else number
+        page = Page(cursor_page.object_list, number, self)
+        page.is_cursor = True
+        page.cursor = cursor_page.cursor
+        page.next_cursor = cursor_page.next_cursor
+        page.previous_cursor = cursor_page.previous_cursor
+        return page
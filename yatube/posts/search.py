@@ -0,0 +1,141 @@
+import re
+from itertools import islice
+
+from django.db import connection
+
+from .models import Post
+from .pagination import (CursorPage, CursorPaginator, decode_cursor,
+                         encode_cursor)
+from .stemmer import stem
+
+TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+# На сколько единиц bm25 пост поднимается за каждый день «свежести».
+# Оценка не зависит от текущего времени, поэтому курсор стабилен.
+RECENCY_PER_DAY = 0.01
+
+# Оценка округляется: сравнение курсора на равенство и порядок строк
+# идут по одним и тем же точным значениям, а ничьи решает id.
+SCORE_DIGITS = 9
+
+SEARCH_SQL = f'''
+    SELECT id, score FROM (
+        SELECT post.id AS id,
+               ROUND(bm25({TABLE}) - %s * julianday(post.pub_date),
+                     {SCORE_DIGITS}) AS score
+        FROM {TABLE}
+        JOIN posts_post AS post ON post.id = {TABLE}.rowid
+        WHERE {TABLE} MATCH %s
+    )
+    {{after}}
+    ORDER BY score, id DESC
+    LIMIT %s
+'''
+AFTER_SQL = 'WHERE score > %s OR (score = %s AND id < %s)'
+
+
+def normalize(text):
+    """Текст в виде основ слов: так он хранится в индексе."""
+    return ' '.join(stem(word) for word in WORD.findall(text.lower()))
+
+
+def match_query(query):
+    """Запрос FTS5: все основы слов, каждая как префикс."""
+    return ' '.join(f'"{term}"*' for term in normalize(query).split())
+
+
+# Есть ли индекс в базе: проверка списка таблиц — один раз на базу.
+_available = {}
+
+
+def available():
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        _available[name] = TABLE in connection.introspection.table_names()
+    return _available[name]
+
+
+def index_post(post_id, text):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [post_id, normalize(text)],
+        )
+
+
+def index_posts(posts, batch_size=500):
+    """Пакетно индексирует посты из пар (id, text), заменяя старые строки."""
+    if not available():
+        return
+    rows = ((post_id, normalize(text)) for post_id, text in posts)
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            cursor.executemany(
+                f'DELETE FROM {TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id, _ in batch],
+            )
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)', batch)
+
+
+def remove_post(post_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def search(query, cursor, per_page, related=()):
+    """
+    Страница результатов поиска с keyset-пагинацией.
+
+    Посты упорядочены по оценке bm25 с поправкой на свежесть. Без FTS5
+    (другая СУБД) поиск деградирует до icontains по дате публикации.
+    """
+    posts = Post.objects.select_related(*related)
+    terms = match_query(query)
+    if not terms:
+        return CursorPaginator(posts.none(), per_page).get_page(None)
+    if not available():
+        posts = posts.filter(text__icontains=query)
+        return CursorPaginator(posts, per_page).get_page(cursor)
+
+    decoded = decode_cursor(cursor)
+    after, params = '', [RECENCY_PER_DAY, terms]
+    if decoded is not None and len(decoded[0]) == 2:
+        try:
+            score, post_id = float(decoded[0][0]), int(decoded[0][1])
+        except (TypeError, ValueError):
+            decoded = None
+        else:
+            after = AFTER_SQL
+            params += [score, score, post_id]
+    else:
+        decoded = None
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            SEARCH_SQL.format(after=after), params + [per_page + 1])
+        rows = db_cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = None
+    if has_next:
+        post_id, score = rows[-1]
+        next_cursor = encode_cursor([score, post_id])
+    found = posts.in_bulk([post_id for post_id, _ in rows])
+    return CursorPage(
+        [found[post_id] for post_id, _ in rows if post_id in found],
+        cursor=cursor if decoded else None,
+        has_next=has_next,
+        has_previous=decoded is not None,
+        next_cursor=next_cursor,
+        previous_cursor=None,
+    )
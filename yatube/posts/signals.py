@@ -0,0 +1,203 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (cache, cards, counters, events, search, thumbnails,
+               timeline, variants)
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def bump_feeds(*scopes):
+    # Второй сдвиг после коммита не дает закешировать страницу,
+    # отрисованную параллельным запросом по еще старым данным.
+    cache.bump(*scopes)
+    transaction.on_commit(lambda: cache.bump(*scopes))
+
+
+def author_scopes(*author_ids):
+    usernames = User.objects.filter(pk__in=author_ids).values_list(
+        'username', flat=True)
+    return [cache.author_scope(username) for username in usernames]
+
+
+def bump_post_feeds(post, group_ids=()):
+    """Сбрасывает кеш лент, в которых виден пост."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True) if group_ids else []
+    bump_feeds(
+        cache.index_scope(),
+        *author_scopes(post.author_id),
+        *(cache.group_scope(slug) for slug in slugs),
+    )
+
+
+def bump_posts_feeds(posts, usernames=(), slugs=()):
+    """Сбрасывает главную и ленты авторов и групп набора постов."""
+    usernames = {*usernames, *posts.values_list(
+        'author__username', flat=True).distinct()}
+    slugs = {*slugs, *posts.exclude(group=None).values_list(
+        'group__slug', flat=True).distinct()}
+    bump_feeds(
+        cache.index_scope(),
+        *(cache.author_scope(username) for username in usernames),
+        *(cache.group_scope(slug) for slug in slugs),
+    )
+
+
+def forget_cards(pairs):
+    if pairs:
+        cards.forget_cards(pairs)
+        transaction.on_commit(lambda: cards.forget_cards(pairs))
+
+
+def forget_post_cards(posts):
+    """Сбрасывает карточки постов, когда меняется их автор или группа."""
+    forget_cards(list(posts.values_list('pk', 'updated')))
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, **kwargs):
+    # Страница профиля закеширована под прежним именем пользователя.
+    instance._previous_username = User.objects.filter(
+        pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Вход меняет только last_login, а его в карточке нет.
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    posts = Post.objects.filter(author=instance)
+    forget_post_cards(posts)
+    previous = getattr(instance, '_previous_username', None)
+    bump_posts_feeds(posts, {instance.username, previous} - {None})
+
+
+def forget_variants(image_variants):
+    # Файлы удаляются только после коммита: при откате пост все еще
+    # ссылается на них.
+    if image_variants:
+        transaction.on_commit(lambda: variants.delete(image_variants))
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    # Пост мог уйти из другой группы: ее ленту тоже нужно сбросить.
+    instance._previous_group_id = None
+    if instance.pk is None:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'updated', 'image', 'image_variants').first()
+    if previous is not None:
+        instance._previous_group_id, updated, image, image_variants = (
+            previous)
+        cards.forget_card(instance.pk, updated)
+        if instance.image.name != image:
+            instance.thumbnail = ''
+            instance.image_variants = ''
+            forget_variants(image_variants)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        transaction.on_commit(lambda: events.publish_post(
+            instance.pk, instance.author_id, instance.group_id))
+    thumbnails.schedule(instance)
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance.pk, instance.text)
+    bump_post_feeds(instance, [getattr(instance, '_previous_group_id', None)])
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    cards.forget_card(instance.pk, instance.updated)
+    search.remove_post(instance.pk)
+    forget_variants(instance.image_variants)
+    bump_post_feeds(instance)
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, **kwargs):
+    instance._previous_slug = Group.objects.filter(
+        pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_feeds(cache.group_scope(instance.slug))
+        return
+    posts = instance.posts.all()
+    forget_post_cards(posts)
+    previous = getattr(instance, '_previous_slug', None)
+    bump_posts_feeds(posts, slugs={instance.slug, previous} - {None})
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # SET_NULL обновляет посты одним UPDATE без сигналов, а после
+    # удаления уже не узнать, какие посты были в группе.
+    posts = instance.posts.all()
+    instance._post_cards = list(posts.values_list('pk', 'updated'))
+    instance._post_authors = set(posts.values_list(
+        'author__username', flat=True).distinct())
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    forget_cards(getattr(instance, '_post_cards', []))
+    bump_feeds(
+        cache.index_scope(),
+        cache.group_scope(instance.slug),
+        *(cache.author_scope(username)
+          for username in getattr(instance, '_post_authors', ())),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+        transaction.on_commit(lambda: events.publish_comment(
+            instance.pk, instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        # Профиль подписчика тоже меняется: в нем число его подписок.
+        # Лента /follow/ не кешируется страницей, сдвигать там нечего.
+        bump_feeds(*author_scopes(instance.author_id, instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+    timeline.trim(instance.user_id, instance.author_id)
+    # Порог пересекается ровно одной отпиской: счетчик меняется через F().
+    if counters.followers_count(
+            instance.author_id) == timeline.FANOUT_FOLLOWERS_LIMIT:
+        timeline.author_returned(instance.author_id)
+    bump_feeds(*author_scopes(instance.author_id, instance.user_id))
@@ -0,0 +1,116 @@
+"""
+Стеммер Snowball для русского языка.
+
+Алгоритм: https://snowballstem.org/algorithms/russian/stemmer.html
+Окончания отрезаются только внутри области RV, словообразовательные
+суффиксы — только внутри R2.
+"""
+
+VOWELS = frozenset('аеиоуыэюя')
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _strip(word, groups):
+    """
+    Отрезает самое длинное окончание из групп или возвращает None.
+
+    Окончания первой группы отрезаются, только если перед ними «а» или
+    «я»; иначе совпадение считается неудачным целиком, как в Snowball.
+    """
+    after_a, plain = groups
+    matches = [s for s in after_a + plain if word.endswith(s)]
+    if not matches:
+        return None
+    suffix = max(matches, key=len)
+    stem = word[:-len(suffix)]
+    if suffix in after_a and not stem.endswith(('а', 'я')):
+        return None
+    return stem
+
+
+def _adjectival(word):
+    stem = _strip(word, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _strip(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+def _region(word, start=0):
+    """Позиция после первой согласной, идущей за гласной."""
+    for position in range(start + 1, len(word)):
+        if word[position] not in VOWELS and word[position - 1] in VOWELS:
+            return position + 1
+    return len(word)
+
+
+def _remove_ending(rv):
+    """Шаг 1: деепричастие, иначе возвратность и окончание."""
+    stripped = _strip(rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    reflexive = _strip(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    for remove in (_adjectival, lambda w: _strip(w, VERB),
+                   lambda w: _strip(w, NOUN)):
+        stripped = remove(rv)
+        if stripped is not None:
+            return stripped
+    return rv
+
+
+def _tidy_up(rv):
+    """Шаг 4: превосходная степень, двойное «н» и мягкий знак."""
+    superlative = next((s for s in SUPERLATIVE if rv.endswith(s)), None)
+    if superlative is not None:
+        rv = rv[:-len(superlative)]
+        return rv[:-1] if rv.endswith('нн') else rv
+    if rv.endswith('нн') or rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS),
+        len(word),
+    )
+    r2 = _region(word, _region(word)) - rv_start
+    prefix, rv = word[:rv_start], _remove_ending(word[rv_start:])
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and len(rv) - len(suffix) >= r2:
+            rv = rv[:-len(suffix)]
+            break
+    return prefix + _tidy_up(rv)
@@ -0,0 +1,164 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from . import cache, search, timeline
+from .bulk import keep_auto_now
+from .counters import repair_post_counters, repair_user_counters
+from .models import Comment, Follow, Group, Post, TimelineEntry, User
+
+BATCH_SIZE = 500
+# Доля постов вне групп.
+NO_GROUP_SHARE = 0.2
+
+
+def power_law(items, exponent, rnd):
+    """
+    Накопленные веса закона Ципфа для случайной перестановки items.
+
+    Вес i-го по популярности элемента пропорционален 1 / (i + 1) ** s:
+    немногие авторы пишут и собирают подписчиков больше всех остальных.
+    """
+    items = list(items)
+    rnd.shuffle(items)
+    weights = (1 / (rank + 1) ** exponent for rank in range(len(items)))
+    return items, list(accumulate(weights))
+
+
+def generate(users=100, groups=10, posts=10000, comments=10000,
+             follows=1000, seed=0, prefix='synthetic', exponent=1.1):
+    """
+    Быстро заполняет базу синтетическими данными через bulk_create.
+
+    Тексты пишет Faker на русском, активность авторов, популярность
+    постов, групп и число подписчиков распределены по степенному закону.
+    Одинаковый seed дает одинаковый набор данных. Сигналы при этом не
+    срабатывают: счетчики, ленты и поисковый индекс собирает finalize().
+    """
+    rnd = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    now = timezone.now()
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'{prefix}_{i}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+            )
+            for i in range(users)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith=f'{prefix}_').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        (
+            Group(
+                title=fake.sentence(nb_words=3).rstrip('.'),
+                slug=f'{prefix}-{i}',
+                description=fake.paragraph(nb_sentences=2),
+            )
+            for i in range(groups)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    group_ids = list(Group.objects.filter(
+        slug__startswith=f'{prefix}-').values_list('pk', flat=True))
+
+    writers, writer_weights = power_law(user_ids, exponent, rnd)
+    topics, topic_weights = power_law(group_ids, exponent, rnd)
+    authors = rnd.choices(writers, cum_weights=writer_weights, k=posts)
+    with keep_auto_now(Post, 'pub_date'):
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=fake.paragraph(nb_sentences=rnd.randint(1, 6)),
+                    author_id=author_id,
+                    group_id=(
+                        None if not topics or rnd.random() < NO_GROUP_SHARE
+                        else rnd.choices(topics, cum_weights=topic_weights)[0]
+                    ),
+                    pub_date=now - timedelta(minutes=posts - i),
+                )
+                for i, author_id in enumerate(authors)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    post_ids = list(Post.objects.filter(
+        author_id__in=user_ids).values_list('pk', flat=True))
+
+    popular, popular_weights = power_law(post_ids, exponent, rnd)
+    with keep_auto_now(Comment, 'created'):
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    post_id=post_id,
+                    author_id=rnd.choices(
+                        writers, cum_weights=writer_weights)[0],
+                    text=fake.sentence(nb_words=rnd.randint(3, 15)),
+                    created=now - timedelta(seconds=comments - i),
+                )
+                for i, post_id in enumerate(rnd.choices(
+                    popular, cum_weights=popular_weights, k=comments))
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    stars, star_weights = power_law(user_ids, exponent, rnd)
+    pairs = set(zip(
+        rnd.choices(writers, cum_weights=writer_weights, k=follows),
+        rnd.choices(stars, cum_weights=star_weights, k=follows),
+    ))
+    Follow.objects.bulk_create(
+        (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs if user_id != author_id
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return user_ids, group_ids, post_ids
+
+
+def finalize(prefix='synthetic'):
+    """
+    Досчитывает то, что обычно делают сигналы: счетчики, ленты, поиск
+    и поколения кеша страниц.
+    """
+    repair_user_counters(BATCH_SIZE)
+    repair_post_counters(BATCH_SIZE)
+    readers = User.objects.filter(username__startswith=f'{prefix}_')
+    posts = Post.objects.filter(author__in=readers)
+    celebrities = User.objects.filter(
+        counters__followers_count__gt=timeline.FANOUT_FOLLOWERS_LIMIT)
+    follows = Follow.objects.filter(user__in=readers).exclude(
+        author__in=celebrities).values_list('user_id', 'author_id')
+    posts_by_author = defaultdict(list)
+    for post_id, author_id, pub_date in posts.values_list(
+            'pk', 'author_id', 'pub_date').iterator():
+        posts_by_author[author_id].append((post_id, pub_date))
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id, author_id in follows.iterator()
+            for post_id, pub_date in posts_by_author[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    search.index_posts(posts.values_list('pk', 'text').iterator())
+    groups = Group.objects.filter(slug__startswith=f'{prefix}-')
+    scopes = [
+        cache.index_scope(),
+        *map(cache.author_scope, readers.values_list('username', flat=True)),
+        *map(cache.group_scope, groups.values_list('slug', flat=True)),
+    ]
+    # Внутри транзакции сдвигаем после коммита: иначе параллельный
+    # запрос закеширует страницу по еще старым данным.
+    transaction.on_commit(lambda: cache.bump(*scopes))
@@ -0,0 +1,113 @@
+import re
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import paginator
+
+from . import const
+from ..admin import TEXT_PREVIEW_LENGTH
+from ..models import Comment, Group, Post, User
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        cls.test_group = Group.objects.create(
+            title=const.GROUP_TITLE,
+            slug=const.GROUP_SLUG,
+            description=const.GROUP_DESCRIPTION,
+        )
+        cls.post_url = reverse('admin:posts_post_changelist')
+        cls.comment_url = reverse('admin:posts_comment_changelist')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, number):
+        for i in range(number):
+            post = Post.objects.create(
+                text=f'Пост {i} ' + 'длинный текст ' * 50,
+                author=self.post_author,
+                group=self.test_group,
+            )
+            Comment.objects.create(
+                post=post, author=self.post_author, text='Комментарий')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow(self):
+        """Число запросов списка не зависит от числа строк на странице."""
+        self.add_rows(1)
+        small = [self.count_queries(url)
+                 for url in (self.post_url, self.comment_url)]
+        self.add_rows(10)
+        large = [self.count_queries(url)
+                 for url in (self.post_url, self.comment_url)]
+        self.assertEqual(large, small)
+
+    def test_text_is_truncated(self):
+        """В списке выводится только начало текста."""
+        self.add_rows(1)
+        response = self.client.get(self.post_url)
+        post = response.context['cl'].result_list[0]
+        self.assertLessEqual(
+            len(site._registry[Post].short_text(post)), TEXT_PREVIEW_LENGTH)
+        self.assertNotContains(response, 'длинный текст ' * 10)
+
+    def test_comment_list_skips_post_text(self):
+        """Список комментариев не читает полный текст постов."""
+        self.add_rows(1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.comment_url)
+        self.assertContains(response, 'Пост 0 длинный')
+        self.assertNotContains(response, 'длинный текст ' * 10)
+        self.assertFalse(any(
+            re.search(r'(?<!SUBSTR\()"posts_post"\."text"', query['sql'])
+            for query in queries.captured_queries
+        ))
+
+    def test_comment_ordering_uses_index(self):
+        """Сортировку списка комментариев поддерживает индекс."""
+        sql, params = Comment.objects.order_by(
+            '-created', '-pk')[:20].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('comment_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_count_is_estimated_for_large_tables(self):
+        """Для большой таблицы число строк оценивается без COUNT(*)."""
+        self.add_rows(3)
+        with mock.patch.object(paginator, 'ESTIMATE_THRESHOLD', 1):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.post_url)
+        self.assertEqual(
+            response.context['cl'].result_count,
+            Post.objects.latest('pk').pk,
+        )
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] and 'posts_post' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_search_uses_full_text_index(self):
+        """Поиск в админке идет по полнотекстовому индексу."""
+        Post.objects.create(text='Про подписки', author=self.post_author)
+        Post.objects.create(text='Совсем другое', author=self.post_author)
+        response = self.client.get(self.post_url, {'q': 'подписками'})
+        found = response.context['cl'].result_list
+        self.assertEqual(
+            [post.text_preview for post in found], ['Про подписки'])
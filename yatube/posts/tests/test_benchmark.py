@@ -0,0 +1,132 @@
+import json
+import os
+import tempfile
+from collections import Counter
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import search, synthetic
+from ..cache import author_scope, get_versions, group_scope, index_scope
+from ..management.commands.benchmark import percentile
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class GenerateDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_data', users=30, groups=5, posts=300, comments=300,
+            follows=200, seed=1, stdout=StringIO(),
+        )
+
+    def test_counts(self):
+        """Создается запрошенное число пользователей и постов."""
+        self.assertEqual(
+            User.objects.filter(username__startswith='synthetic_').count(),
+            30,
+        )
+        self.assertEqual(Post.objects.count(), 300)
+
+    def test_power_law(self):
+        """Самый активный автор пишет намного больше медианного."""
+        per_author = sorted(Counter(
+            Post.objects.values_list('author_id', flat=True)).values())
+        self.assertGreater(
+            per_author[-1], 5 * per_author[len(per_author) // 2])
+
+    def test_finalize(self):
+        """Счетчики, ленты и поисковый индекс собраны без сигналов."""
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user_id=follow.user_id).count(),
+            Post.objects.filter(
+                author__following__user_id=follow.user_id).count(),
+        )
+        word = post.text.split()[0]
+        self.assertIn(post, search.search(word, None, 300))
+
+    def test_feeds_are_bumped(self):
+        """Новые данные сдвигают поколения главной, групп и авторов."""
+        scopes = (
+            index_scope(), group_scope('fresh-0'), author_scope('fresh_0'))
+        before = get_versions(*scopes)
+        with mock.patch.object(
+            synthetic.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            call_command(
+                'generate_data', users=1, groups=1, posts=5, comments=0,
+                follows=0, prefix='fresh', stdout=StringIO(),
+            )
+        after = get_versions(*scopes)
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                self.assertNotEqual(before[scope], after[scope])
+
+    def test_seed_is_reproducible(self):
+        """Одинаковый seed дает одинаковые тексты."""
+        call_command(
+            'generate_data', users=30, groups=5, posts=300, comments=0,
+            follows=0, seed=1, prefix='again', stdout=StringIO(),
+        )
+        first = Post.objects.filter(
+            author__username__startswith='synthetic_').order_by('pk')
+        second = Post.objects.filter(
+            author__username__startswith='again_').order_by('pk')
+        self.assertEqual(
+            list(first.values_list('text', flat=True)),
+            list(second.values_list('text', flat=True)),
+        )
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_data', users=10, groups=2, posts=50, comments=50,
+            follows=30, stdout=StringIO(),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def benchmark(self, **options):
+        out = StringIO()
+        call_command(
+            'benchmark', requests=3, warmup=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_percentile(self):
+        """Процентиль считается по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_report(self):
+        """Отчет содержит процентили и число запросов по страницам."""
+        report = json.loads(self.benchmark(json=True))
+        self.assertIn('follow_index', report)
+        for result in report.values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries'], 0)
+
+    def test_baseline_regression(self):
+        """Рост p95 сверх допуска относительно baseline — ошибка."""
+        report = json.loads(self.benchmark(json=True, cold=True))
+        baseline = {
+            name: {'p95_ms': result['p95_ms'] / 1000 or 0.001}
+            for name, result in report.items()
+        }
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.json', delete=False) as file:
+            json.dump(baseline, file)
+        self.addCleanup(os.remove, file.name)
+        with self.assertRaises(CommandError):
+            self.benchmark(baseline=file.name)
@@ -0,0 +1,100 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from .. import cache as feed_cache
+
+THREADS = 8
+COMPUTE_SECONDS = 0.2
+
+
+class SingleFlightCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(COMPUTE_SECONDS)
+        return 'значение'
+
+    def run_concurrently(self, target):
+        barrier = threading.Barrier(THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(target())
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_only_one_recomputation_per_key(self):
+        """Одновременные промахи по ключу пересчитывают его один раз."""
+        results = self.run_concurrently(
+            lambda: feed_cache.get_or_compute('ключ', self.compute, 60))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({value for value, _ in results}, {'значение'})
+
+    def test_stale_value_is_served_while_revalidating(self):
+        """Пока запись пересчитывается, остальные получают старую."""
+        cache.set('ключ', {
+            'value': 'старое', 'expires': time.time() - 1, 'delta': 0.1,
+        })
+        cache.add('ключ:lock', 'чужой воркер')
+        value, hit = feed_cache.get_or_compute('ключ', self.compute, 60)
+        self.assertEqual((value, hit), ('старое', True))
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_lock_of_another_worker_is_kept(self):
+        """Медленный воркер не снимает чужую блокировку."""
+        def slow_compute():
+            # Своя блокировка истекла, ее взял другой воркер.
+            cache.set('ключ:lock', 'чужой воркер')
+            return 'значение'
+
+        feed_cache.get_or_compute('ключ', slow_compute, 60)
+        self.assertEqual(cache.get('ключ:lock'), 'чужой воркер')
+
+    def test_probabilistic_early_expiration(self):
+        """Дорогая запись может пересчитаться до своего срока."""
+        cache.set('ключ', {
+            'value': 'старое', 'expires': time.time() + 10, 'delta': 5,
+        })
+        with mock.patch.object(feed_cache.random, 'random', return_value=0):
+            self.assertEqual(
+                feed_cache.get_or_compute('ключ', self.compute, 60),
+                ('старое', True)
+            )
+        with mock.patch.object(
+                feed_cache.random, 'random', return_value=0.99999):
+            self.assertEqual(
+                feed_cache.get_or_compute('ключ', self.compute, 60),
+                ('значение', False)
+            )
+
+    def test_cached_view_renders_once_under_load(self):
+        """Закешированная страница рендерится один раз на все запросы."""
+        @feed_cache.versioned_cache_page(lambda: ['index'])
+        def view(request):
+            return HttpResponse(self.compute())
+
+        def get():
+            request = RequestFactory().get('/')
+            request.user = AnonymousUser()
+            return view(request).content
+
+        results = self.run_concurrently(get)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(set(results), {'значение'.encode()})
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from . import const
+from .. import signals
+from ..cards import card_key, render_cards
+from ..models import Group, Post, User
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_group = Group.objects.create(
+            title=const.GROUP_TITLE,
+            slug=const.GROUP_SLUG,
+            description=const.GROUP_DESCRIPTION,
+        )
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Первый пост', author=self.post_author, group=self.test_group)
+        self.other = Post.objects.create(
+            text='Второй пост', author=self.post_author)
+
+    def posts(self):
+        return Post.objects.select_related('author', 'group')
+
+    def test_cards_are_cached(self):
+        """Повторный вывод карточек берется из кеша."""
+        cards = render_cards(self.posts())
+        self.assertIn('Второй пост', cards[0])
+        self.assertIn(const.GROUP_SLUG, cards[1])
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertEqual(render_cards(self.posts()), cards)
+
+    def test_edit_invalidates_only_its_card(self):
+        """Правка поста сбрасывает только его карточку."""
+        render_cards(self.posts())
+        other_key = card_key(self.other.pk, self.other.updated)
+        old_key = card_key(self.post.pk, self.post.updated)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertIsNone(cache.get(old_key))
+        self.assertIsNotNone(cache.get(other_key))
+        self.assertIn('Исправленный пост', render_cards(self.posts())[1])
+
+    def test_author_and_group_changes_invalidate_cards(self):
+        """Переименование автора или группы сбрасывает их карточки."""
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            render_cards(self.posts())
+            author = User.objects.get(pk=self.post_author.pk)
+            author.first_name = 'Лев'
+            author.save()
+            self.assertIn('Лев', render_cards(self.posts())[0])
+            group = Group.objects.get(pk=self.test_group.pk)
+            group.slug = 'renamed'
+            group.save()
+            self.assertIn('renamed', render_cards(self.posts())[1])
+
+    def test_group_delete_invalidates_cards_and_feeds(self):
+        """Удаление группы убирает ее из карточек и кешированных лент."""
+        index = reverse('posts:index')
+        profile = reverse(
+            'posts:profile', kwargs={'username': const.POST_AUTHOR})
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            for url in (index, profile):
+                self.assertContains(self.client.get(url), const.GROUP_SLUG)
+            Group.objects.get(pk=self.test_group.pk).delete()
+            for url in (index, profile):
+                with self.subTest(url=url):
+                    self.assertNotContains(
+                        self.client.get(url), const.GROUP_SLUG)
+
+    def test_renames_invalidate_feeds(self):
+        """Переименование автора или группы сбрасывает кеш лент."""
+        index = reverse('posts:index')
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            self.client.get(index)
+            author = User.objects.get(pk=self.post_author.pk)
+            author.username = 'renamed_author'
+            author.save()
+            self.assertContains(self.client.get(index), 'renamed_author')
+            self.assertContains(self.client.get(reverse(
+                'posts:group_posts', kwargs={'slug': const.GROUP_SLUG},
+            )), 'renamed_author')
+            group = Group.objects.get(pk=self.test_group.pk)
+            group.slug = 'renamed_group'
+            group.save()
+            self.assertContains(self.client.get(index), 'renamed_group')
+            self.assertContains(self.client.get(reverse(
+                'posts:profile', kwargs={'username': 'renamed_author'},
+            )), 'renamed_group')
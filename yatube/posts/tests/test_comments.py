@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from . import const
+from ..models import Comment, Post, User
+from ..views import COMMENTS_ON_PAGE
+
+COMMENTS_TOTAL = COMMENTS_ON_PAGE + 5
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        cls.post = Post.objects.create(
+            text=const.POST_TEXT, author=cls.post_author)
+        for i in range(COMMENTS_TOTAL):
+            Comment.objects.create(
+                post=cls.post, author=cls.post_author,
+                text=f'Комментарий {i}')
+        cls.comments_url = reverse('posts:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_newest_comments(self):
+        """Страница поста выводит только последние комментарии."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertEqual(comments[0].text, f'Комментарий {COMMENTS_TOTAL - 1}')
+        self.assertContains(response, comments.next_cursor)
+
+    def test_fragment_returns_next_batch(self):
+        """Фрагмент отдает следующую порцию комментариев в HTML."""
+        first = self.client.get(self.comments_url)
+        cursor = first.context['comments'].next_cursor
+        response = self.client.get(self.comments_url, {'cursor': cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertContains(response, 'Комментарий 0')
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_fragment_returns_json(self):
+        """Фрагмент умеет отдавать комментарии в JSON."""
+        data = self.client.get(self.comments_url, {'format': 'json'}).json()
+        self.assertEqual(len(data['comments']), COMMENTS_ON_PAGE)
+        self.assertEqual(data['comments'][0]['author'], const.POST_AUTHOR)
+        data = self.client.get(self.comments_url, {
+            'format': 'json', 'cursor': data['next_cursor'],
+        }).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            [f'Комментарий {i}' for i in reversed(range(5))],
+        )
+        self.assertIsNone(data['next_cursor'])
+
+    def test_fragment_of_missing_post(self):
+        """Комментарии несуществующего поста — 404."""
+        url = reverse('posts:post_comments', args=[self.post.pk + 1])
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from . import const
+from .. import signals
+from ..models import Comment, Group, Post, User
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_group = Group.objects.create(
+            title=const.GROUP_TITLE,
+            slug=const.GROUP_SLUG,
+            description=const.GROUP_DESCRIPTION,
+        )
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author,
+            group=self.test_group)
+        self.author_client = Client()
+        self.author_client.force_login(self.post_author)
+
+    def feed_urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[const.GROUP_SLUG]),
+            reverse('posts:profile', args=[const.POST_AUTHOR]),
+        )
+
+    def test_feeds_answer_not_modified(self):
+        """Ленты отдают 304 без рендеринга, пока поколение не сменилось."""
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        Post.objects.create(
+            text='Новый пост', author=self.post_author, group=self.test_group)
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer_and_page(self):
+        """Валидатор различает зрителя и параметры страницы."""
+        url = reverse('posts:index')
+        anonymous = self.client.get(url)['ETag']
+        self.assertNotEqual(anonymous, self.author_client.get(url)['ETag'])
+        second_page = self.client.get(url, {'page': 2})['ETag']
+        self.assertNotEqual(anonymous, second_page)
+
+    def test_post_detail_validators(self):
+        """Страница поста меняет валидатор при новом комментарии."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.post, author=self.post_author, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+    def test_post_detail_etag_follows_deletes_and_renames(self):
+        """Удаление комментария и правки автора или группы меняют ETag."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        comment = Comment.objects.create(
+            post=self.post, author=self.post_author, text='Комментарий')
+        author = User.objects.get(pk=self.post_author.pk)
+        author.first_name = 'Лев'
+        group = Group.objects.get(pk=self.test_group.pk)
+        group.title = 'Новое название'
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            for change in (comment.delete, author.save, group.save):
+                with self.subTest(change=change):
+                    etag = self.client.get(url)['ETag']
+                    change()
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_cache_control(self):
+        """Анонимные страницы публичные, страницы пользователя — личные."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        public = self.client.get(url)['Cache-Control']
+        self.assertIn('public', public)
+        self.assertIn('s-maxage', public)
+        private = self.author_client.get(url)['Cache-Control']
+        self.assertIn('private', private)
+        self.assertIn('no-cache', private)
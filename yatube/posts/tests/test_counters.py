@@ -0,0 +1,124 @@
+import itertools
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core.db_router import ReplicaRouter
+
+from . import const
+from ..counters import user_counters
+from ..models import Comment, Follow, Post, User, UserCounters
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        cls.reader = User.objects.create_user(username='reader')
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counter_follows_lifecycle(self):
+        """Счетчик постов меняется при создании и удалении поста."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        self.assertEqual(self.counters(self.post_author).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.counters(self.post_author).posts_count, 0)
+
+    def test_comment_counter_follows_lifecycle(self):
+        """Счетчик комментариев поста меняется вместе с комментариями."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_post_save_keeps_comment_counter(self):
+        """Сохранение устаревшего экземпляра не затирает счетчик."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        stale.text = 'Новый текст'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(post.comments_count, 1)
+
+    def test_post_save_keeps_explicit_counter_change(self):
+        """Явно измененный в экземпляре счетчик сохраняется."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        post.comments_count = 5
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 5)
+
+    def test_follow_counters_follow_lifecycle(self):
+        """Счетчики подписок обновляются у обеих сторон."""
+        follow = Follow.objects.create(
+            user=self.reader, author=self.post_author)
+        self.assertEqual(self.counters(self.post_author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.post_author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_cascade_delete_keeps_counters_consistent(self):
+        """Каскадное удаление пользователя не ломает чужие счетчики."""
+        user = User.objects.create_user(username='leaving_user')
+        Follow.objects.create(user=user, author=self.post_author)
+        Post.objects.create(text=const.POST_TEXT, author=user)
+        user_id = user.pk
+        user.delete()
+        self.assertEqual(self.counters(self.post_author).followers_count, 0)
+        self.assertFalse(UserCounters.objects.filter(pk=user_id).exists())
+
+    def test_recount_command_repairs_drift(self):
+        """Команда recount_counters исправляет рассинхрон."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        UserCounters.objects.filter(user=self.post_author).update(
+            posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        UserCounters.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('recount_counters', stdout=out)
+        self.assertIn('пользователи — 2, посты — 1', out.getvalue())
+        self.assertEqual(self.counters(self.post_author).posts_count, 1)
+        self.assertTrue(UserCounters.objects.filter(user=self.reader))
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_missing_counters_are_read_from_primary(self):
+        """Строка счетчиков создается и читается без реплики."""
+        Post.objects.create(text=const.POST_TEXT, author=self.post_author)
+        UserCounters.objects.filter(user=self.post_author).delete()
+        author = User.objects.get(pk=self.post_author.pk)
+        # Строки нет и на «реплике», а любое следующее чтение с нее
+        # упадет: такого псевдонима нет.
+        reads = itertools.chain(['default'], itertools.repeat('replica'))
+        with mock.patch.object(
+                ReplicaRouter, 'db_for_read', side_effect=reads):
+            self.assertEqual(user_counters(author).posts_count, 1)
+
+    def test_post_detail_creates_missing_counters(self):
+        """Страница поста создает недостающую строку счетчиков автора."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        UserCounters.objects.filter(user=self.post_author).delete()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, 'Всего постов автора: <span>1</span>')
+        self.assertEqual(self.counters(self.post_author).posts_count, 1)
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core.asgi import SCOPE_KEY
+
+from . import const
+from .. import events, signals
+from ..models import Comment, Group, Post, User
+
+
+class BusTest(SimpleTestCase):
+    def setUp(self):
+        self.bus = events.Bus(history=3)
+
+    def test_publish_reaches_subscribers_of_channel(self):
+        """Событие получают только подписчики его канала."""
+        index = self.bus.subscribe(['index'])
+        group = self.bus.subscribe(['group:1'])
+        event = self.bus.publish('index', 'post', {'id': 1})
+        self.assertEqual(index.get(0), event)
+        self.assertIsNone(group.get(0))
+
+    def test_replay_after_last_id(self):
+        """Переподключение по Last-Event-ID отдает пропущенное."""
+        first = self.bus.publish('index', 'post', {'id': 1})
+        second = self.bus.publish('index', 'post', {'id': 2})
+        subscription = self.bus.subscribe(['index'], last_id=first.id)
+        self.assertEqual(subscription.get(0), second)
+        self.assertIsNone(subscription.get(0))
+
+    def test_unknown_last_id_resets_stream(self):
+        """Номер другого процесса или вне истории дает reset."""
+        for i in range(5):
+            self.bus.publish('index', 'post', {'id': i})
+        for last_id in (1, 6, 100):
+            with self.subTest(last_id=last_id):
+                subscription = self.bus.subscribe(['index'], last_id)
+                chunks = list(events.stream(subscription, heartbeat=0))
+                self.assertEqual(chunks[-1], events.RESET)
+        subscription = self.bus.subscribe(['index'], last_id=2)
+        self.assertEqual(subscription.get(0).id, 3)
+
+    def test_overflow_resets_stream(self):
+        """Не успевающий клиент получает reset, подписка закрывается."""
+        subscription = self.bus.subscribe(['index'])
+        for i in range(events.QUEUE_SIZE + 1):
+            self.bus.publish('index', 'post', {'id': i})
+        chunks = list(events.stream(subscription, heartbeat=0))
+        self.assertEqual(chunks[-1], 'event: reset\ndata: {}\n\n')
+        self.assertEqual(dict(self.bus._subscribers), {})
+
+    def test_history_is_bounded_across_channels(self):
+        """Публикация без подписчиков не копит каналы и историю."""
+        for i in range(5):
+            self.bus.publish(f'post:{i}', 'comment', {'id': i})
+        self.assertEqual(dict(self.bus._subscribers), {})
+        self.assertEqual(len(self.bus._history), 3)
+
+    def test_stream_limit(self):
+        """Сверх лимита подписка не открывается, закрытая его освобождает."""
+        bus = events.Bus(max_streams=1)
+        subscription = bus.subscribe(['index'])
+        with self.assertRaises(events.TooManyStreams):
+            bus.subscribe(['index'])
+        subscription.close()
+        subscription.close()
+        bus.subscribe(['index'])
+
+    def test_async_stream_waits_without_thread(self):
+        """astream ждет события в цикле событий и будится публикацией."""
+        subscription = self.bus.subscribe(['index'])
+
+        async def read():
+            content = events.astream(subscription, heartbeat=5)
+            chunks = [await content.__anext__()]
+            timer = threading.Timer(
+                0.05, self.bus.publish, ('index', 'post', {'id': 7}))
+            timer.start()
+            chunks.append(await content.__anext__())
+            await content.aclose()
+            return chunks
+
+        chunks = asyncio.run(read())
+        self.assertIn('data: {"id": 7}', chunks[1])
+        self.assertTrue(subscription.closed)
+
+    def test_stream_ends_after_duration(self):
+        """Поток закрывается по таймеру, а не держит воркер вечно."""
+        subscription = self.bus.subscribe(['index'])
+        self.bus.publish('index', 'post', {'id': 7})
+        chunks = list(events.stream(subscription, heartbeat=0, duration=0.01))
+        self.assertIn('event: post\ndata: {"id": 7}\n\n', chunks[1])
+
+
+# Сигналы публикуют события после коммита, в TestCase его нет.
+@mock.patch.object(
+    signals.transaction, 'on_commit', side_effect=lambda callback: callback())
+class LiveFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        cls.group = Group.objects.create(
+            title=const.GROUP_TITLE, slug=const.GROUP_SLUG)
+
+    def setUp(self):
+        cache.clear()
+        # Потоки отдаются только под ASGI: помечаем запросы так же.
+        self.client = Client(**{SCOPE_KEY: {'type': 'http'}})
+
+    def read(self, url, last_id):
+        """Первые куски потока после переподключения с last_id."""
+        response = self.client.get(url, HTTP_LAST_EVENT_ID=str(last_id))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = iter(response.streaming_content)
+        chunks = [next(content), next(content)]
+        response.close()
+        return b''.join(chunks).decode()
+
+    def test_new_post_is_pushed_to_feeds(self, on_commit):
+        """Новый пост приходит в поток главной и своей группы."""
+        last_id = events.bus.publish('test', 'ping', {}).id
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author, group=self.group)
+        for query in ('feed=index', f'group={const.GROUP_SLUG}'):
+            with self.subTest(query=query):
+                chunk = self.read(
+                    f'{reverse("posts:live_events")}?{query}', last_id)
+                self.assertIn(f'data: {{"id": {post.pk}}}', chunk)
+
+    def test_new_comment_is_pushed_to_post(self, on_commit):
+        """Новый комментарий приходит в поток своего поста."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        last_id = events.bus.publish('test', 'ping', {}).id
+        comment = Comment.objects.create(
+            post=post, author=self.post_author, text='Новый')
+        chunk = self.read(
+            f'{reverse("posts:live_events")}?post={post.pk}', last_id)
+        self.assertIn('event: comment', chunk)
+        self.assertIn(f'"id": {comment.pk}', chunk)
+
+    def test_live_events_need_asgi(self, on_commit):
+        """Под WSGI поток не открывается, страницы без EventSource."""
+        post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author)
+        wsgi = Client()
+        response = wsgi.get(reverse('posts:live_events'))
+        self.assertEqual(response.status_code, 204)
+        for url in (reverse('posts:index'),
+                    reverse('posts:post_detail', args=[post.pk])):
+            with self.subTest(url=url):
+                self.assertNotContains(wsgi.get(url), 'EventSource')
+                self.assertContains(self.client.get(url), 'EventSource')
+
+    def test_too_many_streams_is_503(self, on_commit):
+        """При исчерпанном лимите потоков клиент получает 503."""
+        with mock.patch.object(events.bus, 'max_streams', 0):
+            response = self.client.get(reverse('posts:live_events'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_unknown_feed_is_404(self, on_commit):
+        """Поток для несуществующей группы или поста — 404."""
+        url = reverse('posts:live_events')
+        for query in ('group=missing', 'post=abc', 'post=999'):
+            with self.subTest(query=query):
+                response = self.client.get(f'{url}?{query}')
+                self.assertEqual(response.status_code, 404)
+
+    def test_fragments_render_only_new_items(self, on_commit):
+        """Фрагменты отдают разметку только запрошенных постов."""
+        old = Post.objects.create(text='Старый', author=self.post_author)
+        new = Post.objects.create(text='Новый пост', author=self.post_author)
+        comment = Comment.objects.create(
+            post=new, author=self.post_author, text='Свежий комментарий')
+        response = self.client.get(
+            reverse('posts:new_posts'), {'ids': f'{new.pk},x'})
+        self.assertContains(response, 'Новый пост')
+        self.assertNotContains(response, old.text)
+        response = self.client.get(
+            reverse('posts:new_comments', args=[new.pk]),
+            {'ids': comment.pk})
+        self.assertContains(response, 'Свежий комментарий')
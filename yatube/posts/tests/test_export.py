@@ -0,0 +1,86 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import const
+from ..models import Comment, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title=const.GROUP_TITLE, slug=const.GROUP_SLUG)
+        cls.post = Post.objects.create(
+            text=const.POST_TEXT, author=cls.post_author, group=cls.group)
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.staff)
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        Comment.objects.create(
+            post=cls.post, author=cls.staff, text='Комментарий')
+
+    def export(self, *args, **options):
+        out = StringIO()
+        call_command('export_data', *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_command_jsonl(self):
+        """Команда выгружает посты построчно в JSON Lines."""
+        rows = [json.loads(line)
+                for line in self.export('posts').splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [self.post.pk, self.old_post.pk])
+        self.assertEqual(rows[0]['author'], const.POST_AUTHOR)
+        self.assertEqual(rows[0]['group'], const.GROUP_SLUG)
+
+    def test_command_filters(self):
+        """Фильтры по дате, группе и автору сужают выгрузку."""
+        today = timezone.localdate().isoformat()
+        for option in (f'--from={today}', f'--group={const.GROUP_SLUG}',
+                       f'--author={const.POST_AUTHOR}'):
+            with self.subTest(option=option):
+                out = self.export('posts', option)
+                self.assertEqual(
+                    [json.loads(line)['id'] for line in out.splitlines()],
+                    [self.post.pk],
+                )
+
+    def test_command_csv(self):
+        """CSV начинается с заголовка и содержит комментарии."""
+        rows = list(csv.reader(StringIO(
+            self.export('comments', format='csv'))))
+        self.assertEqual(rows[0], ['id', 'post_id', 'author', 'text',
+                                   'created'])
+        self.assertEqual(rows[1][3], 'Комментарий')
+
+    def test_view_streams_for_staff(self):
+        """Сотрудник получает потоковый ответ, остальные — редирект."""
+        url = reverse('posts:export', args=['posts'])
+        self.client.force_login(self.post_author)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            url, {'format': 'csv', 'group': const.GROUP_SLUG})
+        self.assertTrue(response.streaming)
+        self.assertIn('posts.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_view_validates_filters(self):
+        """Неверная дата или вид выгрузки — ошибка, а не пустой файл."""
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('posts:export', args=['posts']), {'date_from': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('posts:export', args=['users']))
+        self.assertEqual(response.status_code, 404)
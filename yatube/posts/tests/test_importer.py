@@ -0,0 +1,233 @@
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from .. import search
+from ..cache import author_scope, get_versions, group_scope, index_scope
+from ..importer import Checkpoint, iter_records
+from ..models import Follow, Group, Post, TimelineEntry, User
+
+DUMP = os.path.join(settings.BASE_DIR, 'dump.json')
+
+
+def write_lines(records):
+    """Временный файл JSON Lines, удаляемый после теста."""
+    file = tempfile.NamedTemporaryFile(
+        'w', suffix='.jsonl', delete=False, encoding='utf-8')
+    with file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return file.name
+
+
+def user(pk, username):
+    return {'model': 'auth.user', 'pk': pk, 'fields': {
+        'username': username, 'password': '!'}}
+
+
+def post(pk, author, text='Текст', group=None):
+    return {'model': 'posts.post', 'pk': pk, 'fields': {
+        'text': text, 'author': author, 'group': group,
+        'pub_date': '2022-01-01T00:00:00Z'}}
+
+
+class IterRecordsTest(TestCase):
+    def test_array_and_lines(self):
+        """Массив и JSON Lines разбираются одинаково, даже мелкими кусками."""
+        records = [{'model': 'a', 'pk': i, 'fields': {'text': '}' * i}}
+                   for i in range(5)]
+        for text in (json.dumps(records),
+                     '\n'.join(json.dumps(r) for r in records)):
+            with self.subTest(text=text[:10]):
+                self.assertEqual(
+                    list(iter_records(io.StringIO(text), read_size=7)),
+                    records,
+                )
+
+    def test_truncated(self):
+        """Обрезанный файл — ошибка, а не молча потерянная запись."""
+        with self.assertRaises(ValueError):
+            list(iter_records(io.StringIO('[{"model": "a"}, {"mod')))
+
+    def test_malformed_line_is_skipped(self):
+        """Битая строка пропускается, файл дальше не буферизуется."""
+        text = '{"model": "a"}\n{"model": oops}\n{"model": "b"}\n'
+        file = io.StringIO(text)
+        errors = []
+        records = iter_records(file, read_size=16, on_error=errors.append)
+        self.assertEqual(next(records), {'model': 'a'})
+        self.assertEqual(next(records), {'model': 'b'})
+        self.assertEqual(errors, ['Некорректный JSON около символа 25'])
+        self.assertEqual(list(records), [])
+        file = io.StringIO(text + '{"model": "c"}\n' * 10 ** 4)
+        with self.assertRaisesMessage(ValueError, 'около символа 25'):
+            list(iter_records(file, read_size=16))
+        self.assertLess(file.tell(), 100)
+
+    def test_single_line_array_resyncs_on_next_record(self):
+        """В однострочном массиве битая запись не теряет следующие."""
+        records = [{'model': 'a', 'pk': i, 'fields': {'text': '}, {'}}
+                   for i in range(50)]
+        broken = '{"model": "b", "fields": {"text": "}, {", oops}}'
+        text = json.dumps(records[:1] + ['BROKEN'] + records[1:]).replace(
+            '"BROKEN"', broken)
+        errors = []
+        self.assertEqual(
+            list(iter_records(
+                io.StringIO(text), read_size=16, on_error=errors.append)),
+            records,
+        )
+        self.assertEqual(len(errors), 1)
+
+    def test_record_without_model_goes_to_error_handler(self):
+        """Запись не-объект или без model отдается on_error."""
+        errors = []
+        records = iter_records(
+            io.StringIO('[{"model": "a"}, 5, {"pk": 1}, {"model": "b"}]'),
+            on_error=errors.append,
+        )
+        self.assertEqual(list(records), [{'model': 'a'}, {'model': 'b'}])
+        self.assertEqual(len(errors), 2)
+        with self.assertRaisesMessage(ValueError, 'без поля model'):
+            list(iter_records(io.StringIO('[5]')))
+
+
+class ImportDumpTest(TestCase):
+    def import_dump(self, path, **options):
+        out = StringIO()
+        call_command('import_dump', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dump_json(self):
+        """Импорт dump.json создает пользователей, группы, посты и ленты."""
+        out = self.import_dump(
+            DUMP, chunk_size=50, checkpoint=self.checkpoint_path())
+        self.assertEqual(User.objects.count(), 7)
+        self.assertEqual(Group.objects.count(), 4)
+        self.assertEqual(Post.objects.count(), 49)
+        self.assertEqual(Follow.objects.count(), 2)
+        self.assertIn('пропущено admin.logentry: 207', out)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(
+                author__following__user=follow.user).count(),
+        )
+        author = Post.objects.first().author
+        self.assertEqual(
+            author.counters.posts_count, author.posts.count())
+        self.assertFalse(os.path.exists(self.checkpoint_path()))
+
+    def test_forward_references_and_natural_keys(self):
+        """Ссылки вперед откладываются, естественные ключи разрешаются."""
+        path = write_lines([
+            post(10, ['leo'], text='Война и мир'),
+            user(1, 'leo'),
+            post(11, 1),
+            post(12, 99),
+        ])
+        self.addCleanup(os.remove, path)
+        out = self.import_dump(path, chunk_size=1)
+        self.assertEqual(
+            set(Post.objects.values_list('pk', flat=True)), {10, 11})
+        self.assertIn('posts.post: ссылки не найдены у 1 записей', out)
+        self.assertEqual(
+            [found.pk for found in search.search('войну', None, 10)], [10])
+
+    def test_resume(self):
+        """Импорт продолжается с контрольной точки, пропуская готовое."""
+        path = write_lines([user(1, 'leo'), post(10, 1), post(11, 1)])
+        self.addCleanup(os.remove, path)
+        checkpoint = Checkpoint(f'{path}.checkpoint')
+        checkpoint.records = 2
+        checkpoint.save()
+        self.addCleanup(checkpoint.delete)
+        with self.assertRaises(CommandError):
+            self.import_dump(path)
+        User.objects.create(pk=1, username='leo')
+        self.import_dump(path, resume=True)
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)),
+                         [11])
+        self.assertFalse(checkpoint.exists())
+
+    def test_repeated_import_is_idempotent(self):
+        """Повторный импорт того же файла не создает дубликатов."""
+        path = write_lines([user(1, 'leo'), post(10, 1)])
+        self.addCleanup(os.remove, path)
+        self.import_dump(path)
+        self.import_dump(path)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_existing_rows_are_not_reindexed(self):
+        """Пропущенные дубликаты не переиндексируются поиском."""
+        author = User.objects.create(pk=1, username='leo')
+        Post.objects.create(pk=10, author=author, text='Война и мир')
+        path = write_lines([user(1, 'leo'), post(10, 1, text='Анна')])
+        self.addCleanup(os.remove, path)
+        out = self.import_dump(path)
+        self.assertIn('posts.post: 0', out)
+        self.assertEqual(list(search.search('Анна', None, 10)), [])
+        self.assertEqual(
+            [found.pk for found in search.search('войну', None, 10)], [10])
+
+    def test_feeds_are_bumped(self):
+        """Импорт сдвигает поколения главной и затронутых лент."""
+        path = write_lines([
+            user(1, 'leo'),
+            user(2, 'reader'),
+            {'model': 'posts.group', 'pk': 1, 'fields': {
+                'title': 'Классика', 'slug': 'classic',
+                'description': ''}},
+            post(10, 1, group=1),
+            {'model': 'posts.follow', 'pk': 1, 'fields': {
+                'user': 2, 'author': 1}},
+        ])
+        self.addCleanup(os.remove, path)
+        scopes = (index_scope(), group_scope('classic'),
+                  author_scope('leo'), author_scope('reader'))
+        before = get_versions(*scopes)
+        self.import_dump(path)
+        after = get_versions(*scopes)
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                self.assertNotEqual(before[scope], after[scope])
+
+    def test_malformed_record_is_reported(self):
+        """Битая запись пропускается с предупреждением, импорт идет дальше."""
+        path = write_lines([user(1, 'leo'), post(10, 1)])
+        self.addCleanup(os.remove, path)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('{"model": "posts.post", oops\n')
+            file.write(json.dumps(post(11, 1)) + '\n')
+        out = self.import_dump(path, stderr=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('pk', flat=True)),
+            [10, 11],
+        )
+        self.assertIn('пропущено битых записей: 1', out)
+
+    def checkpoint_path(self):
+        path = os.path.join(tempfile.gettempdir(), 'dump.json.checkpoint')
+        self.addCleanup(Checkpoint(path).delete)
+        return path
+
+
+class DeferIndexesTest(TransactionTestCase):
+    def test_indexes_restored(self):
+        """Отложенные индексы снова на месте после импорта."""
+        path = write_lines([user(1, 'leo'), post(10, 1)])
+        self.addCleanup(os.remove, path)
+        call_command(
+            'import_dump', path, defer_indexes=True, stdout=StringIO())
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table)
+        self.assertIn('post_pub_date_idx', constraints)
+        self.assertEqual(Post.objects.count(), 1)
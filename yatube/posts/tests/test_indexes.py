@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from . import const
+from ..models import Follow, Post, User
+
+
+class FeedIndexesTest(TestCase):
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена на уровне БД."""
+        user = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username=const.POST_AUTHOR)
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+
+    def test_explain_feeds_shows_index_usage(self):
+        """Бенчмарк показывает планы с индексами и без, откатывая данные."""
+        out = StringIO()
+        call_command(
+            'explain_feeds', users=5, groups=2, posts=50, comments=50,
+            follows=10, repeat=1, stdout=out,
+        )
+        before, after = out.getvalue().split('Без составных индексов')
+        self.assertIn('post_group_pub_date_idx', before)
+        self.assertNotIn('post_group_pub_date_idx', after)
+        self.assertFalse(Post.objects.exists())
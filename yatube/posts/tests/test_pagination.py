@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import const
+from ..models import Group, Post, User
+from ..pagination import CursorPaginator, decode_cursor, encode_cursor
+
+POSTS_TOTAL = 23
+PER_PAGE = 10
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_group = Group.objects.create(
+            title=const.GROUP_TITLE,
+            slug=const.GROUP_SLUG,
+            description=const.GROUP_DESCRIPTION,
+        )
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        Post.objects.bulk_create(
+            Post(
+                text=f'Тестовый текст {i} поста',
+                author=cls.post_author,
+                group=cls.test_group,
+            )
+            for i in range(POSTS_TOTAL)
+        )
+        cls.expected_ids = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_cursor_roundtrip(self):
+        """Токен курсора декодируется в исходные значения."""
+        token = encode_cursor(['2022-01-01 10:00:00+00:00', 5], reverse=True)
+        self.assertEqual(
+            decode_cursor(token),
+            (['2022-01-01 10:00:00+00:00', 5], True)
+        )
+        self.assertIsNone(decode_cursor('не-курсор'))
+
+    def test_walk_forward_and_back(self):
+        """Проход по курсорам вперед и назад сохраняет порядок ленты."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        seen = [post.id for page in pages for post in page]
+        self.assertEqual(seen, self.expected_ids)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(
+            [post.id for post in back],
+            [post.id for post in pages[1]]
+        )
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор отдает первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        page = paginator.get_page('мусор')
+        self.assertEqual(
+            [post.id for post in page], self.expected_ids[:PER_PAGE])
+
+    def test_crafted_cursor_returns_first_page(self):
+        """Курсор с неподходящими типами значений — первая страница."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        for values in ([[1], {'a': 1}], [{'a': 1}, [2]]):
+            with self.subTest(values=values):
+                page = paginator.get_page(encode_cursor(values))
+                self.assertEqual(
+                    [post.id for post in page],
+                    self.expected_ids[:PER_PAGE])
+
+    def test_feeds_use_cursor_by_default(self):
+        """Ссылки ленты без параметров — курсоры, страница без COUNT(*)."""
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj, Page)
+        self.assertTrue(page_obj.is_cursor)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        self.assertNotContains(response, '?page=')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] or 'OFFSET' in query['sql']
+            for query in queries.captured_queries
+        ))
+        legacy = self.guest_client.get(url, {'page': 2})
+        self.assertEqual(
+            [post.id for post in legacy.context['page_obj']],
+            self.expected_ids[PER_PAGE:2 * PER_PAGE])
+
+    def test_feeds_support_cursor_mode(self):
+        """Ленты переключаются в keyset-режим параметром cursor."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(const.GROUP_SLUG,)),
+            reverse('posts:profile', args=(const.POST_AUTHOR,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(f'{url}?cursor=')
+                page_obj = response.context['page_obj']
+                self.assertTrue(page_obj.is_cursor)
+                self.assertEqual(len(page_obj), PER_PAGE)
+                self.assertContains(
+                    response, f'?cursor={page_obj.next_cursor}')
+                response = self.guest_client.get(
+                    f'{url}?cursor={page_obj.next_cursor}')
+                self.assertEqual(
+                    [post.id for post in response.context['page_obj']],
+                    self.expected_ids[PER_PAGE:2 * PER_PAGE]
+                )
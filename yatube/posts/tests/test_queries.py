@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import const
+from ..models import Comment, Follow, Group, Post, User
+
+# Жесткий бюджет запросов на страницу при холодном кеше. Он не должен
+# зависеть ни от числа постов на странице, ни от числа комментариев.
+QUERY_BUDGET = {
+    'posts:index': 4,
+    'posts:group_posts': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:follow_index': 5,
+}
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_group = Group.objects.create(
+            title=const.GROUP_TITLE,
+            slug=const.GROUP_SLUG,
+            description=const.GROUP_DESCRIPTION,
+        )
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.post_author)
+        cls.post = Post.objects.create(
+            text=const.POST_TEXT, author=cls.post_author,
+            group=cls.test_group)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_posts': reverse(
+                'posts:group_posts', args=[const.GROUP_SLUG]),
+            'posts:profile': reverse(
+                'posts:profile', args=[const.POST_AUTHOR]),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[self.post.pk]),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def count_queries(self):
+        counts = {}
+        for name, url in self.urls().items():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            counts[name] = len(queries)
+        return counts
+
+    def add_content(self, number):
+        authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(number)
+        ]
+        for author in authors:
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(
+                text=const.POST_TEXT, author=author, group=self.test_group)
+            Post.objects.create(
+                text=const.POST_TEXT, author=self.post_author,
+                group=self.test_group)
+            Comment.objects.create(
+                post=self.post, author=author, text='Комментарий')
+
+    def test_query_count_is_constant(self):
+        """Число запросов не растет вместе с размером страницы."""
+        small = self.count_queries()
+        self.add_content(10)
+        large = self.count_queries()
+        for name, budget in QUERY_BUDGET.items():
+            with self.subTest(view=name):
+                self.assertEqual(large[name], small[name])
+                self.assertLessEqual(large[name], budget)
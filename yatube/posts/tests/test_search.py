@@ -0,0 +1,117 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import const
+from .. import search
+from ..models import Post, User
+from ..stemmer import stem
+
+
+class StemmerTest(TestCase):
+    def test_russian_stems(self):
+        """Словоформы сводятся к одной основе."""
+        words = {
+            'подписками': 'подписк',
+            'подписка': 'подписк',
+            'важнейшие': 'важн',
+            'радостью': 'радост',
+            'прочитавшись': 'прочита',
+            'ёлки': 'елк',
+        }
+        for word, expected in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+
+    def create(self, text, days_ago=0):
+        post = Post.objects.create(text=text, author=self.post_author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=days_ago))
+        return post
+
+    def found(self, query, cursor=None, per_page=10):
+        return search.search(query, cursor, per_page)
+
+    def test_finds_other_word_forms(self):
+        """Поиск находит пост по другой форме слова."""
+        post = self.create('Делюсь новыми подписками')
+        self.create('Совсем другой текст')
+        self.assertEqual(list(self.found('подписка')), [post])
+
+    def test_relevance_and_recency(self):
+        """Релевантные посты выше, при равной релевантности — свежие."""
+        old = self.create('Наши кошки гуляют сами по себе', days_ago=30)
+        new = self.create('Наши кошки гуляют сами по себе')
+        relevant = self.create('Кошки, кошки и кошки', days_ago=1)
+        for i in range(5):
+            self.create(f'Про собак {i}')
+        self.assertEqual(list(self.found('кошка')), [relevant, new, old])
+
+    def test_keyset_pagination(self):
+        """Страницы результатов идут по курсору без повторов."""
+        posts = [self.create(f'Запись номер {i}', days_ago=i)
+                 for i in range(5)]
+        first = self.found('запись', per_page=2)
+        second = self.found('запись', first.next_cursor, per_page=2)
+        third = self.found('запись', second.next_cursor, per_page=2)
+        self.assertEqual(
+            list(first) + list(second) + list(third), posts)
+        self.assertFalse(third.has_next())
+        self.assertTrue(third.has_previous())
+
+    def test_pagination_through_ties(self):
+        """Посты с равной оценкой делятся между страницами по id."""
+        posts = [self.create('Одинаковый текст') for _ in range(3)]
+        Post.objects.update(pub_date=timezone.now())
+        pages, cursor = [], None
+        for _ in posts:
+            page = self.found('одинаковый', cursor, per_page=1)
+            pages += list(page)
+            cursor = page.next_cursor
+        self.assertEqual(pages, posts[::-1])
+        self.assertIsNone(cursor)
+
+    def test_available_is_checked_once(self):
+        """Список таблиц запрашивается один раз, а не на каждый поиск."""
+        search.available()
+        with mock.patch.object(
+            search.connection.introspection, 'table_names',
+        ) as table_names:
+            search.available()
+            self.create('Еще пост')
+        table_names.assert_not_called()
+
+    def test_index_follows_post_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = self.create('Первая версия')
+        post.text = 'Исправленная версия'
+        post.save()
+        self.assertEqual(list(self.found('первая')), [])
+        self.assertEqual(list(self.found('исправленный')), [post])
+        post.delete()
+        self.assertEqual(list(self.found('исправленный')), [])
+
+    def test_fallback_without_fts(self):
+        """Без FTS5 поиск работает через icontains."""
+        post = self.create('Поиск без индекса')
+        with mock.patch.object(search, 'available', return_value=False):
+            self.assertEqual(list(self.found('без индекса')), [post])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты."""
+        self.create('Пост о погоде')
+        response = self.client.get(reverse('posts:search'), {'q': 'погода'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertContains(response, 'Пост о погоде')
+        response = self.client.get(reverse('posts:search'), {'q': '"*'})
+        self.assertContains(response, 'Ничего не найдено')
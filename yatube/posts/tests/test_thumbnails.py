@@ -0,0 +1,255 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import const
+from .. import signals, thumbnails, variants
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+THUMBNAIL_URL = '/media/cache/thumbnail.gif'
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=const.SMALL_GIF, content_type='image/gif')
+
+
+# Нарезку делает sorl-thumbnail, здесь проверяется только конвейер.
+@mock.patch.object(
+    thumbnails, 'get_thumbnail',
+    return_value=mock.Mock(url=THUMBNAIL_URL),
+)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text=const.POST_TEXT, author=self.post_author, image=uploaded())
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_upload_schedules_generation(self, get_thumbnail):
+        """Сохранение картинки ставит миниатюру в очередь после коммита."""
+        with mock.patch.object(
+                thumbnails.transaction, 'on_commit',
+                side_effect=lambda callback: callback()), \
+                mock.patch.object(thumbnails, '_executor') as executor:
+            post = Post.objects.create(
+                text=const.POST_TEXT, author=self.post_author,
+                image=uploaded())
+        executor.submit.assert_called_once_with(
+            thumbnails._work, post.pk, post.image.name)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_without_workers_generates_inline(self, get_thumbnail):
+        """При THUMBNAIL_WORKERS = 0 миниатюра делается без пула."""
+        with mock.patch.object(
+                thumbnails.transaction, 'on_commit',
+                side_effect=lambda callback: callback()), \
+                mock.patch.object(thumbnails, '_executor') as executor:
+            post = Post.objects.create(
+                text=const.POST_TEXT, author=self.post_author,
+                image=uploaded())
+        executor.submit.assert_not_called()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail, THUMBNAIL_URL)
+
+    def test_page_falls_back_to_original(self, get_thumbnail):
+        """Пока миниатюры нет, страница показывает оригинал."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertContains(self.client.get(url), self.post.image.url)
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail, THUMBNAIL_URL)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, THUMBNAIL_URL)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_new_image_resets_thumbnail(self, get_thumbnail):
+        """Замена картинки сбрасывает миниатюру, а старая задача — мимо."""
+        old_image = self.post.image.name
+        self.post.image = uploaded('other.gif')
+        self.post.save()
+        self.assertEqual(self.post.thumbnail, '')
+        self.assertIsNone(thumbnails.generate(self.post.pk, old_image))
+        get_thumbnail.assert_not_called()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail, '')
+
+    def test_command_backfills_thumbnails(self, get_thumbnail):
+        """Команда generate_thumbnails догоняет старые посты."""
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Готово миниатюр: 1', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail, THUMBNAIL_URL)
+
+
+def uploaded_jpeg(size, name='photo.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'JPEG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class VariantsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text=const.POST_TEXT,
+            author=User.objects.create_user(username=const.POST_AUTHOR),
+            image=uploaded_jpeg((1000, 600)),
+        )
+
+    def test_render_widths_and_formats(self):
+        """Варианты не шире оригинала, в каждом поддерживаемом формате."""
+        described = Post(
+            image_variants=variants.render(self.post.image)).variants
+        self.assertEqual(
+            (described['width'], described['height']), (960, 339))
+        types = [source['type'] for source in described['sources']]
+        self.assertEqual(
+            types, [fmt.mime for fmt in variants.supported_formats()])
+        self.assertIn('image/webp', types)
+        self.assertEqual(types[-1], 'image/jpeg')
+        for source in described['sources']:
+            widths = [
+                candidate.split()[-1]
+                for candidate in source['srcset'].split(', ')
+            ]
+            self.assertEqual(widths, ['480w', '960w'])
+        jpeg = described['sources'][-1]['srcset'].split()[0]
+        name = jpeg[len(settings.MEDIA_URL):]
+        with Image.open(f'{TEMP_MEDIA_ROOT}/{name}') as image:
+            self.assertEqual(image.size, (480, 170))
+
+    def test_rerender_overwrites_files(self):
+        """Повторная нарезка пишет в те же файлы, а не рядом."""
+        first = variants.names(variants.render(self.post.image))
+        second = variants.names(variants.render(self.post.image))
+        self.assertEqual(first, second)
+        directory, base = os.path.split(self.post.image.name)
+        files = [
+            name for name in os.listdir(
+                os.path.join(TEMP_MEDIA_ROOT, variants.UPLOAD_TO, directory))
+            if name.startswith(f'{base}-')
+        ]
+        self.assertEqual(len(files), len(second))
+
+    def test_same_stem_does_not_collide(self):
+        """shot.jpg и shot.png получают разные файлы вариантов."""
+        other = Post.objects.create(
+            text=const.POST_TEXT, author=self.post.author,
+            image=uploaded_jpeg((1000, 600), 'shot.png'))
+        self.post.image = uploaded_jpeg((1000, 600), 'shot.jpg')
+        self.post.save()
+        first = variants.names(variants.render(self.post.image))
+        second = variants.names(variants.render(other.image))
+        self.assertFalse(set(first) & set(second))
+        self.assertTrue(all(
+            default_storage.exists(name) for name in first + second))
+
+    def test_foreign_files_are_not_deleted(self):
+        """Удаляются только файлы из каталога вариантов."""
+        image = self.post.image.name
+        value = json.dumps({'sources': [{
+            'type': 'image/jpeg',
+            'srcset': f'{default_storage.url(image)} 480w, '
+                      f'{settings.MEDIA_URL}variants/../{image} 960w',
+        }]})
+        self.assertEqual(variants.names(value), [])
+        variants.delete(value)
+        self.assertTrue(default_storage.exists(image))
+
+    def test_narrow_source_keeps_own_width(self):
+        """Картинка уже наименьшей ширины режется в своей ширине."""
+        self.post.image = uploaded_jpeg((300, 200), 'narrow.jpg')
+        self.post.save()
+        described = Post(
+            image_variants=variants.render(self.post.image)).variants
+        self.assertEqual(
+            (described['width'], described['height']), (300, 106))
+        self.assertTrue(all(
+            source['srcset'].endswith(' 300w')
+            for source in described['sources']
+        ))
+
+    def test_old_variants_are_deleted(self):
+        """Замена картинки и удаление поста удаляют файлы вариантов."""
+        storage = default_storage
+        with mock.patch.object(
+            signals.transaction, 'on_commit',
+            side_effect=lambda callback: callback(),
+        ), mock.patch.object(
+            thumbnails, 'get_thumbnail',
+            return_value=mock.Mock(url=THUMBNAIL_URL),
+        ):
+            thumbnails.generate(self.post.pk, self.post.image.name)
+            self.post.refresh_from_db()
+            old = variants.names(self.post.image_variants)
+            self.assertTrue(old)
+            self.assertTrue(all(storage.exists(name) for name in old))
+            self.post.image = uploaded_jpeg((1000, 600), 'other.jpg')
+            self.post.save()
+            self.assertFalse(any(storage.exists(name) for name in old))
+            thumbnails.generate(self.post.pk, self.post.image.name)
+            self.post.refresh_from_db()
+            new = variants.names(self.post.image_variants)
+            self.post.delete()
+        self.assertFalse(any(storage.exists(name) for name in new))
+
+    def test_avif_only_when_supported(self):
+        """Без кодека AVIF варианты делаются в остальных форматах."""
+        save = dict(Image.SAVE)
+        save.pop('AVIF', None)
+        with mock.patch.dict(Image.SAVE, save, clear=True):
+            self.assertNotIn(
+                'avif',
+                [fmt.extension for fmt in variants.supported_formats()],
+            )
+
+    def test_pages_use_picture(self):
+        """Лента отдает <picture> с ленивой загрузкой, пост — без нее."""
+        with mock.patch.object(
+            thumbnails, 'get_thumbnail',
+            return_value=mock.Mock(url=THUMBNAIL_URL),
+        ):
+            thumbnails.generate(self.post.pk, self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="960" height="339"')
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'loading="eager"')
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from . import const
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username=const.POST_AUTHOR)
+        cls.old_post = Post.objects.create(
+            text=const.POST_TEXT,
+            author=cls.post_author,
+        )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[const.POST_AUTHOR]))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит в ленту уже опубликованные посты автора."""
+        self.follow()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user, post=self.old_post).exists()
+        )
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.post_author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.assertEqual(
+            TimelineEntry.objects.get(user=self.user, post=post).pub_date,
+            post.pub_date
+        )
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[const.POST_AUTHOR]))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты авторов с большим числом подписчиков читаются при запросе."""
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0):
+            Follow.objects.create(user=self.user, author=self.post_author)
+            post = Post.objects.create(
+                text='Пост знаменитости', author=self.post_author)
+            self.assertFalse(
+                TimelineEntry.objects.filter(user=self.user).exists())
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
+
+    def test_author_below_limit_gets_fanned_out_again(self):
+        """Посты, вышедшие при статусе знаменитости, не теряются."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.post_author)
+        Follow.objects.create(user=other, author=self.post_author)
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 1):
+            post = Post.objects.create(
+                text='Пост знаменитости', author=self.post_author)
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=post).exists())
+            Follow.objects.get(user=other).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists())
@@ -193,19 +193,60 @@ class PostViewTest(TestCase):
         self.assertEqual(response.context['comments'][0].text, expected)
 
     def test_index_page_cache(self):
-        """Удаленный пост сохраняется в кеше главной страницы."""
+        """Главная страница отдается из кеша без запросов к базе."""
+        page_content = self.guest_client.get(reverse('posts:index')).content
+        with self.assertNumQueries(0):
+            cached_content = self.guest_client.get(
+                reverse('posts:index')).content
+        self.assertEqual(page_content, cached_content)
+
+    def test_feed_cache_is_invalidated_by_post_changes(self):
+        """Новый или удаленный пост сразу виден во всех лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': const.GROUP_SLUG}),
+            reverse('posts:profile', kwargs={'username': const.POST_AUTHOR}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
         post = Post.objects.create(
             text='Тестируем кеш',
             author=self.post_author,
             group=self.test_group
         )
-        page_content = self.guest_client.get(reverse('posts:index')).content
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn(post, response.context['page_obj'])
         post.delete()
-        cached_content = self.guest_client.get(reverse('posts:index')).content
-        self.assertEqual(page_content, cached_content)
-        cache.clear()
-        cleared_cache = self.guest_client.get(reverse('posts:index')).content
-        self.assertNotEqual(cached_content, cleared_cache)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotIn(post, response.context['page_obj'])
+
+    def test_group_change_invalidates_previous_group(self):
+        """Перенос поста в другую группу сбрасывает кеш обеих групп."""
+        old_group_url = reverse(
+            'posts:group_posts', kwargs={'slug': const.GROUP_SLUG})
+        self.assertIn(
+            self.post,
+            self.guest_client.get(old_group_url).context['page_obj'])
+        self.post.group = self.test_group_2
+        self.post.save()
+        self.assertNotIn(
+            self.post,
+            self.guest_client.get(old_group_url).context['page_obj'])
+
+    def test_follow_invalidates_follower_profile(self):
+        """Подписка сразу меняет число подписок в профиле подписчика."""
+        url = reverse('posts:profile', kwargs={'username': 'mean_tester'})
+        self.assertContains(self.guest_client.get(url), 'подписок: 0')
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[const.POST_AUTHOR]))
+        self.assertContains(self.guest_client.get(url), 'подписок: 1')
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[const.POST_AUTHOR]))
+        self.assertContains(self.guest_client.get(url), 'подписок: 0')
 
     def test_authorised_user_subscribe(self):
         """
@@ -0,0 +1,92 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import get_thumbnail
+
+from core import metrics
+
+from . import variants
+from .models import Post
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SECONDS = metrics.Histogram(
+    'yatube_thumbnail_seconds',
+    'Время нарезки миниатюры поста',
+    labels=('result',),
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2) or 1,
+    thread_name_prefix='thumbnails',
+)
+
+
+def schedule(post):
+    """Ставит миниатюру поста в очередь после коммита транзакции."""
+    if not post.image or post.thumbnail and post.image_variants:
+        return
+    post_id, image = post.pk, post.image.name
+    if not getattr(settings, 'THUMBNAIL_WORKERS', 2):
+        # Без пула миниатюра делается сразу после коммита в том же потоке.
+        transaction.on_commit(lambda: generate(post_id, image))
+        return
+    transaction.on_commit(lambda: _executor.submit(_work, post_id, image))
+
+
+def generate(post_id, image):
+    """
+    Готовит миниатюру и адаптивные варианты и сохраняет их в посте.
+
+    Если картинку успели заменить, результат отбрасывается: новую
+    миниатюру поставит в очередь сохранение новой картинки.
+    """
+    try:
+        post = Post.objects.filter(pk=post_id, image=image).first()
+        if post is None:
+            return None
+        start = time.perf_counter()
+        try:
+            url = get_thumbnail(post.image, GEOMETRY, **OPTIONS).url
+            image_variants = variants.render(post.image)
+        except Exception:
+            THUMBNAIL_SECONDS.observe(time.perf_counter() - start, 'error')
+            raise
+        THUMBNAIL_SECONDS.observe(time.perf_counter() - start, 'ok')
+        # Картинку могли заменить, пока шла нарезка.
+        post = Post.objects.filter(pk=post_id, image=image).first()
+        if post is None:
+            # Варианты старой картинки уже никому не нужны.
+            variants.delete(image_variants)
+        else:
+            post.thumbnail = url
+            post.image_variants = image_variants
+            # Через save(), чтобы сигналы сбросили карточку и ленты.
+            post.save(
+                update_fields=['thumbnail', 'image_variants', 'updated'])
+        return url
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюру поста %s', post_id)
+
+
+def _work(post_id, image):
+    try:
+        return generate(post_id, image)
+    finally:
+        # Соединение потока пула иначе осталось бы открытым навсегда.
+        connection.close()
+
+
+def generate_many(posts, workers=1):
+    """Готовит миниатюры пар (id, картинка); возвращает число готовых."""
+    if workers <= 1:
+        return sum(1 for post_id, image in posts if generate(post_id, image))
+    with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='thumbnails') as pool:
+        return sum(1 for url in pool.map(_work, *zip(*posts)) if url)
@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .counters import followers_count
+from .models import Follow, Post, TimelineEntry
+
+# Авторы с большим числом подписчиков не раскладываются по лентам:
+# их посты подмешиваются при чтении.
+FANOUT_FOLLOWERS_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    return followers_count(author_id) > FANOUT_FOLLOWERS_LIMIT
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя посты автора, на которого он подписался."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fill(follows, posts=None):
+    """
+    Пакетно раскладывает посты по лентам для пар (читатель, автор).
+
+    posts ограничивает раскладываемые посты; по умолчанию берутся все
+    посты авторов. Знаменитости определяются по таблице подписок, а не
+    по счетчикам: при массовом импорте счетчики еще не пересчитаны.
+    """
+    readers = defaultdict(list)
+    for user_id, author_id in follows:
+        readers[author_id].append(user_id)
+    celebrities = Follow.objects.filter(
+        author_id__in=list(readers)).values('author_id').annotate(
+        total=Count('pk')).filter(total__gt=FANOUT_FOLLOWERS_LIMIT)
+    for row in celebrities:
+        del readers[row['author_id']]
+    if posts is None:
+        posts = Post.objects.all()
+    rows = posts.filter(author_id__in=list(readers)).values_list(
+        'pk', 'author_id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, author_id, pub_date in rows.iterator()
+            for user_id in readers[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def author_returned(author_id):
+    """
+    Раскладывает посты автора, который снова ниже порога знаменитости.
+
+    Пока автор был знаменитостью, его новые посты не попадали в ленты;
+    без этого они пропали бы у всех подписчиков после отписки одного.
+    """
+    fill(Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', 'author_id').iterator())
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def celebrity_ids(user):
+    """Авторы из подписок user, чьи посты читаются без материализации."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__counters__followers_count__gt=FANOUT_FOLLOWERS_LIMIT,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def feed(user):
+    """Посты ленты подписок: материализованная часть плюс fan-out-on-read."""
+    celebrities = celebrity_ids(user)
+    if not celebrities:
+        return Post.objects.filter(
+            timeline_entries__user=user
+        ).order_by('-timeline_entries__pub_date', '-pk')
+    materialized = TimelineEntry.objects.filter(
+        user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=materialized) | Q(author_id__in=celebrities)
+    ).order_by('-pub_date', '-pk')
+
+
+def rebuild(user_id):
+    """Заново собирает ленту читателя по его текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(
+        user_id=user_id).values_list('author_id', flat=True)
+    for author_id in author_ids:
+        backfill(user_id, author_id)
@@ -15,7 +15,19 @@ urlpatterns = [
         'posts/<int:post_id>/comment/',
         views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments, name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('events/', views.live_events, name='live_events'),
+    path('fragments/posts/', views.new_posts, name='new_posts'),
+    path(
+        'posts/<int:post_id>/comments/new/',
+        views.new_comments, name='new_comments'
+    ),
+    path('export/<str:kind>/', views.export, name='export'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
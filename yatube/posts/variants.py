@@ -0,0 +1,122 @@
+"""
+Адаптивные варианты картинки поста для <picture> и srcset.
+
+Картинка обрезается по центру в пропорции миниатюры и сохраняется в
+нескольких ширинах и форматах: AVIF, если Pillow умеет его писать,
+WebP и JPEG для старых браузеров. Ширины больше исходной не делаются:
+растянутый вариант весит больше, а четче не становится. Имена файлов
+строятся из полного имени сохраненной картинки — с каталогом,
+уникальным суффиксом хранилища и расширением, — ширины и формата.
+Поэтому photo.jpg и photo.png не делят файлы, а повторная нарезка
+перезаписывает свои файлы, а не копит копии.
+"""
+import io
+import json
+from collections import namedtuple
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+WIDTHS = getattr(settings, 'IMAGE_VARIANT_WIDTHS', (480, 960, 1440))
+# Пропорция миниатюры 960x339.
+ASPECT_RATIO = 339 / 960
+UPLOAD_TO = 'variants/'
+
+Format = namedtuple('Format', 'extension mime pil options')
+
+# Порядок важен: браузер берет первый <source> с понятным ему типом.
+FORMATS = (
+    Format('avif', 'image/avif', 'AVIF', {'quality': 50}),
+    Format('webp', 'image/webp', 'WEBP', {'quality': 75, 'method': 4}),
+    Format('jpg', 'image/jpeg', 'JPEG', {
+        'quality': 80, 'optimize': True, 'progressive': True}),
+)
+
+
+def parse(value):
+    """Описание вариантов из поля поста; пустое или битое — None."""
+    try:
+        return json.loads(value) if value else None
+    except ValueError:
+        return None
+
+
+def supported_formats():
+    """Форматы, которые установленный Pillow умеет сохранять."""
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt.pil in Image.SAVE]
+
+
+def widths_for(source_width):
+    widths = [width for width in WIDTHS if width <= source_width]
+    return widths or [source_width]
+
+
+def names(value, storage=default_storage):
+    """
+    Имена файлов вариантов из описания в поле поста.
+
+    Берутся только файлы из каталога вариантов: описание могло прийти
+    с импортом и ссылаться на чужие файлы, например на оригинал.
+    """
+    described = parse(value)
+    if not isinstance(described, dict):
+        return []
+    result = []
+    for source in described.get('sources', ()):
+        for candidate in source['srcset'].split(', '):
+            url = candidate.split()[0]
+            if not url.startswith(storage.base_url):
+                continue
+            name = unquote(url[len(storage.base_url):])
+            if name.startswith(UPLOAD_TO) and '..' not in name.split('/'):
+                result.append(name)
+    return result
+
+
+def delete(value, storage=default_storage):
+    """Удаляет файлы вариантов, перечисленные в описании."""
+    for name in names(value, storage):
+        storage.delete(name)
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt.pil, **fmt.options)
+    return ContentFile(buffer.getvalue())
+
+
+def render(image_file, storage=default_storage):
+    """
+    Сохраняет варианты картинки и возвращает их описание в JSON.
+
+    Описание содержит размеры наибольшего варианта для атрибутов
+    width и height и по одному srcset на каждый формат.
+    """
+    formats = supported_formats()
+    sources = {fmt.mime: [] for fmt in formats}
+    with image_file.open('rb'), Image.open(image_file) as original:
+        source = ImageOps.exif_transpose(original).convert('RGB')
+        for width in widths_for(source.width):
+            size = (width, max(1, round(width * ASPECT_RATIO)))
+            resized = ImageOps.fit(source, size, Image.LANCZOS)
+            for fmt in formats:
+                name = (f'{UPLOAD_TO}{image_file.name}-{width}'
+                        f'.{fmt.extension}')
+                # Хранилище не перезаписывает файлы, а добавляет суффикс.
+                # Имя принадлежит только этой картинке: удаляется прошлая
+                # нарезка ее же.
+                storage.delete(name)
+                name = storage.save(name, _encode(resized, fmt))
+                sources[fmt.mime].append(f'{storage.url(name)} {width}w')
+    return json.dumps({
+        'width': size[0],
+        'height': size[1],
+        'sources': [
+            {'type': mime, 'srcset': ', '.join(srcset)}
+            for mime, srcset in sources.items()
+        ],
+    })
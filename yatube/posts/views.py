@@ -1,35 +1,86 @@
+from functools import partial
+from http import HTTPStatus
+
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.cache import cache_page
 
-from .forms import CommentForm, PostForm
-from .models import Group, Post, User, Follow
+from core.asgi import is_asgi
+
+from . import events
+from . import export as post_export
+from . import search as post_search
+from . import timeline
+from .cache import (FEED_CACHE_TIMEOUT, author_scope, get_versions,
+                    group_scope, index_scope, versioned_cache_page)
+from .conditional import comments_etag, conditional, feed_etag, post_etag
+from .counters import user_counters
+from .forms import CommentForm, ExportForm, PostForm
+from .models import Comment, Group, Post, User, Follow
+from .pagination import CursorPaginator, KeysetPaginator
 
 POSTS_ON_PAGE:int = 10
+# Все, что читает карточка поста, приходит одним запросом со страницей.
+FEED_RELATED = ('author', 'group')
+COMMENTS_ON_PAGE = 20
+# Больше новых элементов фрагмент за раз не отдает.
+FRAGMENT_LIMIT = 50
 
 
 def paginator(request, post_list):
-    paginator_obj = Paginator(post_list, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    return paginator_obj.get_page(page_number)
+    # ?page= остался только для старых ссылок: OFFSET и COUNT(*).
+    if 'page' in request.GET and 'cursor' not in request.GET:
+        paginator_obj = Paginator(post_list, POSTS_ON_PAGE)
+        return paginator_obj.get_page(request.GET['page'])
+    return KeysetPaginator(post_list, POSTS_ON_PAGE).get_page(
+        request.GET.get('cursor'))
+
+
+def comments_page(post_id, cursor=None):
+    """Порция комментариев поста, от новых к старым."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('text', 'created', 'author__username')
+    return CursorPaginator(
+        comments, COMMENTS_ON_PAGE, ordering=('-created', '-id'),
+    ).get_page(cursor)
+
+
+def index_scopes():
+    return [index_scope()]
+
+
+def group_scopes(slug):
+    return [group_scope(slug)]
+
+
+def profile_scopes(username):
+    return [author_scope(username)]
 
 
-@cache_page(20, key_prefix='index_page')
+@conditional(feed_etag(index_scopes))
+@versioned_cache_page(index_scopes, key_prefix='index_page')
 def index(request):
-    post_list = Post.objects.select_related('group', 'author')
+    post_list = Post.objects.select_related(*FEED_RELATED)
     page_obj = paginator(request, post_list)
     context = {
         'page_obj': page_obj,
         'index': True,
+        'feed_version': get_versions(index_scope())[index_scope()],
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional(feed_etag(group_scopes))
+@versioned_cache_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author')
+    post_list = group.posts.select_related(*FEED_RELATED)
     page_obj = paginator(request, post_list)
     context = {
         'group': group,
@@ -38,13 +89,17 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional(feed_etag(profile_scopes))
+@versioned_cache_page(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    post_list = author.posts.select_related(*FEED_RELATED)
     following = False
     if request.user.is_authenticated:
         if Follow.objects.filter(user=request.user, author=author).exists():
             following = True
+    user_counters(author)
     page_obj = paginator(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -54,19 +109,46 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@conditional(post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), pk=post_id)
+    user_counters(post.author)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'comments': comments,
+        'comments': comments_page(post.pk),
         'form': form,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional(comments_etag)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comments_page(post.pk, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -107,6 +189,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -120,8 +203,7 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user).select_related('author')
+    post_list = timeline.feed(request.user).select_related(*FEED_RELATED)
     page_obj = paginator(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -130,7 +212,106 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = post_search.search(
+        query, request.GET.get('cursor'), POSTS_ON_PAGE, FEED_RELATED)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def event_channels(request):
+    """Каналы шины для ленты или поста из параметров запроса."""
+    if 'post' in request.GET:
+        if not request.GET['post'].isdigit():
+            raise Http404
+        post = get_object_or_404(
+            Post.objects.only('pk'), pk=request.GET['post'])
+        return [events.post_channel(post.pk)]
+    if 'group' in request.GET:
+        group = get_object_or_404(
+            Group.objects.only('pk'), slug=request.GET['group'])
+        return [events.group_channel(group.pk)]
+    if request.GET.get('feed') == 'follow':
+        if not request.user.is_authenticated:
+            return []
+        return [
+            events.author_channel(author_id)
+            for author_id in Follow.objects.filter(
+                user=request.user).values_list('author_id', flat=True)
+        ]
+    return [events.index_channel()]
+
+
+def live_events(request):
+    # Под WSGI поток занимал бы воркер целиком; 204 говорит браузеру
+    # больше не переподключаться.
+    if not is_asgi(request):
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+    last_id = request.META.get('HTTP_LAST_EVENT_ID', '')
+    if last_id and not last_id.isdigit():
+        return HttpResponseBadRequest()
+    last_id = int(last_id) if last_id else None
+    try:
+        subscription = events.bus.subscribe(
+            event_channels(request), last_id)
+    except events.TooManyStreams:
+        response = HttpResponse(status=HTTPStatus.SERVICE_UNAVAILABLE)
+        response['Retry-After'] = events.RETRY_MS // 1000
+        return response
+    response = StreamingHttpResponse(
+        events.stream(subscription), content_type='text/event-stream')
+    # ASGI-обработчик отдает поток из цикла событий, не занимая поток.
+    response.async_content = partial(events.astream, subscription)
+    response['Cache-Control'] = 'no-cache'
+    # nginx иначе копит поток в буфере и события приходят пачками.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def fragment_ids(request):
+    ids = request.GET.get('ids', '').split(',')
+    return [int(pk) for pk in ids if pk.isdigit()][:FRAGMENT_LIMIT]
+
+
+def new_posts(request):
+    posts = Post.objects.select_related(*FEED_RELATED).filter(
+        pk__in=fragment_ids(request))
+    return render(request, 'posts/includes/posts.html', {'page_obj': posts})
+
+
+def new_comments(request, post_id):
+    comments = Comment.objects.filter(
+        post_id=post_id, pk__in=fragment_ids(request),
+    ).select_related('author').only('text', 'created', 'author__username')
+    return render(
+        request, 'posts/includes/comment_list.html', {'comments': comments})
+
+
+@staff_member_required
+def export(request, kind):
+    if kind not in post_export.COLUMNS:
+        raise Http404
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse(form.errors, status=400)
+    filters = dict(form.cleaned_data)
+    file_format = filters.pop('format') or 'jsonl'
+    render_rows, content_type = post_export.FORMATS[file_format]
+    response = StreamingHttpResponse(
+        render_rows(kind, post_export.queryset(kind, **filters)),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{file_format}"')
+    return response
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user == author:
@@ -141,6 +322,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.get(user=request.user, author=author).delete()
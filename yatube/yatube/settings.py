@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
@@ -49,6 +50,9 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.db_router.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -65,7 +69,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,6 +79,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.live_events.live_events',
             ],
         },
     },
@@ -83,14 +88,46 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Точка входа ASGI: yatube.asgi.application (core/asgi.py).
+# Размер пула потоков, в котором выполняются view
+ASGI_THREADS = 10
+# Сколько потоковых ответов (выгрузки, не SSE) отдается одновременно
+ASGI_STREAM_THREADS = 10
+
+# Потоки нарезки миниатюр; 0 — миниатюра делается сразу после коммита
+THUMBNAIL_WORKERS = 2
+
 # Caches
 
+# Общий для всех воркеров хоста кеш в файле SQLite (core/cache.py)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
 
+# Тесты работают с кешем во временном каталоге
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Кеш лент сбрасывается по поколениям, поэтому срок жизни может быть долгим
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Бюджеты запроса для core.middleware.QueryBudgetMiddleware
+QUERY_BUDGET = 30
+SQL_TIME_BUDGET = 0.2
+DUPLICATE_QUERY_LIMIT = 5
+# Server-Timing всем, а не только сотрудникам; по умолчанию равно DEBUG
+# SERVER_TIMING = True
+
+# Токен для /metrics: Prometheus передает его в Authorization: Bearer.
+# Без токена эндпоинт выключен.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
@@ -101,6 +138,22 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения (core.db_router). Локально реплику заменяет копия
+# базы, которую обновляет команда sync_replica:
+# REPLICA_DATABASE=replica.sqlite3 python manage.py runserver
+REPLICA_DATABASE = os.environ.get('REPLICA_DATABASE')
+if REPLICA_DATABASE:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, REPLICA_DATABASE),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи пользователь читает основную базу
+REPLICA_STICKY_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 